@@ -7,7 +7,8 @@ from rainbowio import colorwheel
 from m5stack_unit8.angle import Unit8Angle
 
 i2c = board.STEMMA_I2C()
-angles = Unit8Angle(i2c, brightness=0.2)
+# the brightness uses the LEDs hardware brightness, changing it is cheap
+angles = Unit8Angle(i2c, brightness=0.2, hardware_brightness=True)
 angles.pixels.fill(0)
 
 state = None
@@ -17,8 +18,8 @@ led_status = [True] * 8
 while True:
     # this is the 12 bits positions by default, adjusted to 16 bits
     positions = angles.angles
-    # read 8 bit angles, hopefully more stable
-    positions_8b = angles.angles_8bit
+    # 8 bit angles derived from the last read, hopefully more stable
+    positions_8b = angles.angles_coarse
     # switch
     switch = angles.switch
     # if anything changed
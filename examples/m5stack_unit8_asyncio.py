@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import board
+from m5stack_unit8.encoder import Unit8Encoder
+from m5stack_unit8.async_poller import AsyncPoller
+from m5stack_unit8.events import ENCODER_DELTA, BUTTON_PRESS, SWITCH_TOGGLE
+
+i2c = board.STEMMA_I2C()
+encoder = Unit8Encoder(i2c, brightness=0.2)
+encoder.pixels.fill(0)
+
+
+async def handle_events(poller):
+    while True:
+        event = await poller.queue.get()
+        print(event)
+        if event.kind == ENCODER_DELTA:
+            # show the direction the encoder turned
+            encoder.pixels[event.channel] = 0x00FF00 if event.value > 0 else 0xFF0000
+        elif event.kind == BUTTON_PRESS:
+            encoder.pixels[event.channel] = 0
+        elif event.kind == SWITCH_TOGGLE:
+            encoder.pixels[8] = 0x00FF00 if event.value else 0xFF0000
+
+
+async def blink():
+    # something else running at the same time
+    while True:
+        print("tick")
+        await asyncio.sleep(5)
+
+
+async def main():
+    poller = AsyncPoller(encoder, rate=100)
+    poller.start()
+    await asyncio.gather(handle_events(poller), blink())
+
+
+asyncio.run(main())
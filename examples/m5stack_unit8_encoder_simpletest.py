@@ -7,7 +7,8 @@ from rainbowio import colorwheel
 from m5stack_unit8.encoder import Unit8Encoder
 
 i2c = board.STEMMA_I2C()
-encoder = Unit8Encoder(i2c, brightness=0.2)
+# in tracking mode, the positions are computed from the increments
+encoder = Unit8Encoder(i2c, brightness=0.2, tracking=True)
 
 state = None
 pressed = set()
@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: MIT
 #
 # pylint: disable=line-too-long, superfluous-parens, protected-access
-# pylint: disable=too-few-public-methods, too-many-arguments
+# pylint: disable=too-few-public-methods, too-many-arguments, too-many-instance-attributes
 """
 `m5stack_unit8.angle`
 ================================================================================
@@ -18,6 +18,35 @@ Implementation Notes
 Dev notes: the board expects a stop between write and read rather than a real restart,
 so we cannot use "write_then_readinto", but a write followed by a read.
 
+The board also needs some time between transactions when reading or writing all
+channels. The ``delay`` argument sets that time in seconds (0.8ms by default).
+With ``delay=None`` the delay is adaptive: it starts at 0 and is doubled when a
+transaction fails, the failed transaction being retried, within the attempts and
+budget of the ``retry`` policy if any. A missing board (``ENODEV``) doesn't
+increase it. It is halved after each run of 64 successful transactions, down to
+0, so that it follows the smallest delay that is reliable.
+
+Transactions that fail with an OSError (once the adaptive delay is at its
+maximum) are retried according to the ``retry`` policy (a
+:py:class:`~m5stack_unit8.retry.RetryPolicy`), if any. A read of all the
+channels then retries only the failed channel, and if it still fails, the
+operation returns partial results: the channel's value is 0 and its bit is
+cleared in the ``valid`` bitmask, that 0 is not an angle that was read.
+
+The angles are scaled to 16 bits with integer arithmetic, or with the lookup
+table of the calibration of the potentiometer, if one was set (see
+:py:mod:`m5stack_unit8.calibration`). The raw 12 bits
+values of the last read are kept in ``raw``, and ``angles_coarse`` derives the
+8 bits values from them without reading the board again.
+
+With ``hardware_brightness=True``, the brightness of ``pixels`` is the per-LED
+brightness byte of the board (0-100) instead of a scaling of the colors, so that
+changing it only writes the brightness bytes.
+
+LED writes made inside ``with angle.batch():`` are queued and sent when leaving
+it, keeping only the last value of each LED, see
+:py:class:`~m5stack_unit8.batch.WriteBatch`.
+
 **Hardware:**
 
 * M5Stack 8-Angle Unit with Potentiometer: https://shop.m5stack.com/products/8-angle-unit-with-potentiometer
@@ -31,11 +60,16 @@ so we cannot use "write_then_readinto", but a write followed by a read.
 * Adafruit's Register library: https://github.com/adafruit/Adafruit_CircuitPython_Register
 """
 
+import array
+import errno
 import struct
 import time
 from micropython import const
 from adafruit_bus_device.i2c_device import I2CDevice
 from adafruit_pixelbuf import PixelBuf
+from m5stack_unit8.batch import WriteBatch
+from m5stack_unit8.calibration import table_for
+from m5stack_unit8.base import Unit8Base
 
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
@@ -45,14 +79,31 @@ _ANGLE_12BITS_REGISTER = const(0x00)
 _ANGLE_8BITS_REGISTER = const(0x10)
 _SWITCH_REGISTER = const(0x20)
 _PIXELS_REGISTER = const(0x30)
+_PIXELS_BRIGHTNESS = const(0xFF)
+# registers that can be written, each LED is written separately
+_WRITABLE_SIZE = const(0x54)
+_WRITE_REGIONS = ((0x30, 0x54, 4),)
 
 PRECISION_8BITS = 8
 PRECISION_12BITS = 12
 PRECISIONS = (PRECISION_8BITS, PRECISION_12BITS)
 
+_DEFAULT_DELAY = 0.0008
+_ADAPTIVE_DELAY_STEP = 0.0001
+_ADAPTIVE_DELAY_MAX = 0.0064
+# successful transactions before the adaptive delay is halved
+_ADAPTIVE_DECAY_RUN = const(64)
+
 
 class _U8_Pixels(PixelBuf):
-    """Neopixels object."""
+    """
+    Neopixels object.
+    Only the LEDs that changed since they were last sent are transmitted,
+    or only their brightness byte if the color didn't change.
+    """
+
+    # the hardware brightness byte of the LEDs
+    _level = _PIXELS_BRIGHTNESS
 
     def __init__(self, unit8, brightness, auto_write):
         self.unit8 = unit8
@@ -62,10 +113,60 @@ class _U8_Pixels(PixelBuf):
 
     def _transmit(self, buffer: bytearray) -> None:
         """Update the pixels."""
-        self.unit8._set_leds(buffer)
+        unit8 = self.unit8
+        level = self._level
+        for led in range(9):
+            if unit8._led_changed(buffer, led):
+                unit8._set_leds(buffer, led, led + 1, level)
+            elif unit8._led_shadow[4 * led + 3] != level:
+                unit8._set_led_level(led, level)
 
 
-class Unit8Angle:
+class _U8_HardwarePixels(_U8_Pixels):
+    """
+    Neopixels object using the hardware brightness of the LEDs (0-100).
+    The colors are sent at full resolution, and a change of brightness
+    only writes the brightness bytes.
+    """
+
+    def __init__(self, unit8, brightness, auto_write):
+        self._level = 100
+        super().__init__(unit8, 1.0, auto_write)
+        self._level = min(100, max(0, round(brightness * 100)))
+
+    @property
+    def brightness(self):
+        """Float value between 0 and 1, the hardware brightness of the LEDs"""
+        return self._level / 100
+
+    @brightness.setter
+    def brightness(self, value):
+        level = min(100, max(0, round(value * 100)))
+        if level != self._level:
+            self._level = level
+            if self.auto_write:
+                self.show()
+
+
+class AngleState:
+    """
+    The state of all the inputs of a Unit8Angle at one point in time,
+    as read by :py:meth:`Unit8Angle.snapshot`.
+    ``angles`` are adjusted to be 16 bits: 0-65535, with the calibration.
+    ``valid`` has bit n cleared if angle n could not be read,
+    and bit 8 cleared if the switch could not be read.
+    """
+
+    __slots__ = ("angles", "switch", "timestamp", "valid")
+
+    def __init__(self):
+        self.angles = array.array("H", [0] * 8)
+        self.switch = False
+        self.timestamp = 0.0
+        self.valid = 0x1FF
+
+
+class Unit8Angle(Unit8Base):
     """Driver for the Unit8 8-potentiometers board."""
 
     def __init__(
@@ -75,11 +176,29 @@ class Unit8Angle:
         address=_DEFAULT_ADDRESS,
         brightness=1.0,
         auto_write=True,
+        delay=_DEFAULT_DELAY,
+        shadow=False,
+        retry=None,
+        hardware_brightness=False,
     ):
         self.device = I2CDevice(i2c, address)
         self.register = bytearray(1)
         self.buffer = bytearray(2 * 8)
-        self.pixels = _U8_Pixels(self, brightness, auto_write)
+        self.adaptive = delay is None
+        self.delay = 0 if delay is None else delay
+        self._successes = 0
+        self.retry = retry
+        self.valid = 0xFF
+        self.shadow = shadow
+        self._led_shadow = bytearray(4 * 9)
+        self._led_known = 0
+        self.raw = array.array("H", [0] * 8)
+        self._tables = [None] * 8
+        self._batch = WriteBatch(self, _WRITABLE_SIZE, _WRITE_REGIONS, self._settle)
+        if hardware_brightness:
+            self.pixels = _U8_HardwarePixels(self, brightness, auto_write)
+        else:
+            self.pixels = _U8_Pixels(self, brightness, auto_write)
         self._precision = PRECISION_8BITS
         self.precision = precision
 
@@ -94,78 +213,187 @@ class Unit8Angle:
             raise ValueError(f"Precision must be one of {PRECISIONS}")
         self._precision = value
 
+    def _backoff(self, attempt, deadline, error=None):
+        """
+        Wait before retrying a failed transaction, increasing the adaptive delay
+        or following the retry policy. False if it should not be retried.
+        """
+        self._successes = 0
+        if (
+            self.adaptive
+            and self.delay < _ADAPTIVE_DELAY_MAX
+            and getattr(error, "errno", None) != errno.ENODEV
+            and (self.retry is None or attempt < self.retry.attempts)
+        ):
+            delay = min(max(self.delay * 2, _ADAPTIVE_DELAY_STEP), _ADAPTIVE_DELAY_MAX)
+            if deadline is None or time.monotonic() + delay <= deadline:
+                self.delay = delay
+                time.sleep(delay)
+                return True
+        return super()._backoff(attempt, deadline, error)
+
+    def _succeeded(self, done):
+        """Count a successful transaction, lower the adaptive delay after a run"""
+        if done and self.adaptive and self.delay:
+            self._successes += 1
+            if self._successes >= _ADAPTIVE_DECAY_RUN:
+                self._successes = 0
+                if self.delay >= 2 * _ADAPTIVE_DELAY_STEP:
+                    self.delay /= 2
+                else:
+                    self.delay = 0
+        return done
+
+    def _read(self, bus, register, buffer, start, end, deadline=None, partial=False):
+        return self._succeeded(
+            super()._read(bus, register, buffer, start, end, deadline, partial)
+        )
+
+    def _write(self, bus, buffer, end, deadline=None, partial=False):
+        return self._succeeded(super()._write(bus, buffer, end, deadline, partial))
+
+    def set_calibration(self, num, calibration=None):
+        """
+        Set the :py:class:`~m5stack_unit8.calibration.Calibration` of one
+        potentiometer, None for the default linear scaling.
+        """
+        if num not in range(0, 8):
+            raise ValueError("num must be one of 0-7")
+        self._tables[num] = None if calibration is None else table_for(calibration)
+
     def get_angle(self, num):
         """
         Return the value of one encoder.
-        Values are adjusted to be 16 bits: 0-65535.
+        Values are adjusted to be 16 bits: 0-65535, with the calibration.
         """
         if self._precision == PRECISION_8BITS:
-            return (self.get_angle_8bit(num) * 0xFFFF) // 0xFF
-        # else:
-        return (self.get_angle_12bit(num) * 0xFFFF) // 0xFFF
+            return self._scale(num, self.get_angle_8bit(num))
+        return self._scale(num, self.get_angle_12bit(num))
 
     @property
     def angles(self):
         """
         Return a list with the values of the 8 encoders.
-        Values are adjusted to be 16 bits: 0-65535.
+        Values are adjusted to be 16 bits: 0-65535, with the calibration.
+        """
+        return tuple(self.angles_into([0] * 8))
+
+    def angles_into(self, buf):
         """
+        Read the values of the 8 encoders into ``buf`` without allocating,
+        ``buf`` can be an ``array.array("H")`` or any mutable sequence of 8 ints.
+        Values are adjusted to be 16 bits: 0-65535, with the calibration.
+        """
+        with self.device as bus:
+            if self._precision == PRECISION_8BITS:
+                self._read_channels(bus, _ANGLE_8BITS_REGISTER, 1)
+            else:
+                self._read_channels(bus, _ANGLE_12BITS_REGISTER, 2)
+        self._scale_angles(buf)
+        return buf
+
+    def _scale(self, num, value):
+        """
+        Scale a raw value of the current precision to 16 bits, with the table
+        of the calibration if any, and keep it as 12 bits in ``raw``.
+        """
+        table = self._tables[num]
         if self._precision == PRECISION_8BITS:
-            return tuple((byte * 0xFFFF) // 0xFF for byte in self.angles_8bit)
-        # else:
-        return tuple((byte * 0xFFFF) // 0xFFF for byte in self.angles_12bit)
+            self.raw[num] = value << 4 | value >> 4
+            if table is None:
+                return (value * 0xFFFF) // 0xFF
+        else:
+            value = min(value, 0xFFF)
+            self.raw[num] = value
+            if table is None:
+                return (value * 0xFFFF) // 0xFFF
+        return table[self.raw[num]]
+
+    def _scale_angles(self, buf):
+        """Adjust the raw values in the buffer to 16 bits into buf"""
+        buffer = self.buffer
+        if self._precision == PRECISION_8BITS:
+            for num in range(8):
+                buf[num] = self._scale(num, buffer[num])
+        else:
+            for num in range(8):
+                buf[num] = self._scale(num, buffer[2 * num] | buffer[2 * num + 1] << 8)
+
+    @property
+    def angles_coarse(self):
+        """
+        Return a list with 8 bits values (0-255) of the 8 encoders,
+        derived from the raw values of the last read, without reading the board.
+        """
+        return tuple(value >> 4 for value in self.raw)
 
     def get_angle_12bit(self, num):
         """Return the raw 12 bits value (0-4095) of one encoder"""
         if num not in range(0, 8):
             raise ValueError("num must be one of 0-7")
-        self.register[0] = _ANGLE_12BITS_REGISTER + num * 2
         with self.device as bus:
-            bus.write(self.register)
-            bus.readinto(self.buffer, end=2)
-        return struct.unpack("<H", self.buffer[:2])[0]
+            self._read(bus, _ANGLE_12BITS_REGISTER + num * 2, self.buffer, 0, 2)
+        value = self.buffer[0] | self.buffer[1] << 8
+        self.raw[num] = min(value, 0xFFF)
+        return value
 
     @property
     def angles_12bit(self):
         """Return a list with the raw 12 bits values (0-4095) of the 8 encoders"""
         with self.device as bus:
-            for num in range(8):
-                self.register[0] = _ANGLE_12BITS_REGISTER + num * 2
-                bus.write(self.register)
-                bus.readinto(self.buffer, start=num * 2, end=(num + 1) * 2)
-                time.sleep(0.0008)
-        return struct.unpack("<8H", self.buffer)
+            self._read_channels(bus, _ANGLE_12BITS_REGISTER, 2)
+        values = struct.unpack("<8H", self.buffer)
+        for num in range(8):
+            self.raw[num] = min(values[num], 0xFFF)
+        return values
 
     def get_angle_8bit(self, num):
         """Return the raw 8 bits value (0-255) of one encoder"""
         if num not in range(0, 8):
             raise ValueError("num must be one of 0-7")
-        self.register[0] = _ANGLE_8BITS_REGISTER + num
         with self.device as bus:
-            bus.write(self.register)
-            bus.readinto(self.buffer, end=1)
-        return struct.unpack("<B", self.buffer[:2])[0]
+            self._read(bus, _ANGLE_8BITS_REGISTER + num, self.buffer, 0, 1)
+        return self.buffer[0]
 
     @property
     def angles_8bit(self):
         """Return a list with the raw 8 bits values (0-255) of the 8 encoders"""
         with self.device as bus:
-            for num in range(8):
-                self.register[0] = _ANGLE_8BITS_REGISTER + num
-                bus.write(self.register)
-                bus.readinto(self.buffer, start=num, end=num + 1)
-                time.sleep(0.0008)
+            self._read_channels(bus, _ANGLE_8BITS_REGISTER, 1)
         return struct.unpack("<8B", self.buffer[:8])
 
     @property
     def switch(self):
         """The state of the switch"""
-        self.register[0] = _SWITCH_REGISTER
         with self.device as bus:
-            bus.write(self.register)
-            bus.readinto(self.buffer, end=1)
+            self._read(bus, _SWITCH_REGISTER, self.buffer, 0, 1)
         return bool(self.buffer[0])
 
+    def snapshot(self, state=None):
+        """
+        Read the angles (with the current precision) and the switch under one
+        bus lock. Update and return ``state``, or a new :py:class:`AngleState`.
+        """
+        if state is None:
+            state = AngleState()
+        buffer = self.buffer
+        deadline = self._deadline()
+        with self.device as bus:
+            if self._precision == PRECISION_8BITS:
+                self._read_channels(bus, _ANGLE_8BITS_REGISTER, 1, deadline)
+            else:
+                self._read_channels(bus, _ANGLE_12BITS_REGISTER, 2, deadline)
+            self._scale_angles(state.angles)
+            valid = self.valid
+            if self._read(bus, _SWITCH_REGISTER, buffer, 0, 1, deadline, True):
+                valid |= 1 << 8
+            else:
+                buffer[0] = 0
+        state.switch = bool(buffer[0])
+        state.valid = valid
+        state.timestamp = time.monotonic()
+        return state
+
     def set_led(self, position, color, brightness=100):
         """Set the color to one RGB LED"""
         if position not in range(0, 9):
@@ -181,25 +409,85 @@ class Unit8Angle:
         self.buffer[0] = _PIXELS_REGISTER + 4 * position
         self.buffer[1:4] = color
         self.buffer[4] = brightness
-        with self.device as bus:
-            bus.write(self.buffer, end=5)
+        self._batch.send(self.buffer, 5)
+        self._led_shadow[4 * position : 4 * position + 4] = self.buffer[1:5]
+        self._led_known |= 1 << position
 
     def get_led(self, position):
-        """Get the current color of an RGB LED"""
+        """
+        Get the current color of an RGB LED.
+        With ``shadow`` enabled, a color that was written or read before
+        is returned without reading the board.
+        """
+        index = 4 * self._load_led(position)
+        return tuple(self._led_shadow[index : index + 3])
+
+    def get_led_brightness(self, position):
+        """
+        Get the current hardware brightness (0-100) of an RGB LED.
+        With ``shadow`` enabled, it is returned without reading the board
+        if it was written or read before.
+        """
+        return self._led_shadow[4 * self._load_led(position) + 3]
+
+    def _load_led(self, position):
+        """Read an LED's registers into the shadow, unless it can be used"""
         if position not in range(0, 9):
             raise ValueError("pixel position must be one of 0-8")
-        self.register[0] = _PIXELS_REGISTER + 4 * position
+        if not (self.shadow and self._led_known & (1 << position)):
+            with self.device as bus:
+                self._read_led(bus, position)
+        return position
+
+    def _read_led(self, bus, led):
+        """Read an LED's color and brightness into the shadow"""
+        index = 4 * led
+        self._read(bus, _PIXELS_REGISTER + index, self._led_shadow, index, index + 4)
+        self._led_known |= 1 << led
+
+    def refresh(self):
+        """Read the LED colors and brightness into the shadow registers"""
         with self.device as bus:
-            bus.write(self.register)
-            bus.read(self.buffer, end=4)
-        return tuple(self.buffer[:3])
+            for led in range(9):
+                self._read_led(bus, led)
+                self._settle()
+
+    def _led_changed(self, buffer, led):
+        """Whether an LED in the buffer differs from what was last sent"""
+        if not self._led_known & (1 << led):
+            return True
+        index = 3 * led
+        shadow = self._led_shadow
+        return (
+            buffer[index] != shadow[4 * led]
+            or buffer[index + 1] != shadow[4 * led + 1]
+            or buffer[index + 2] != shadow[4 * led + 2]
+        )
 
-    def _set_leds(self, buffer):
-        """Set all LEDs with a binary buffer"""
-        for led in range(9):
+    def _set_leds(self, buffer, start=0, end=9, level=_PIXELS_BRIGHTNESS):
+        """
+        Set the LEDs from start to end (excluded) with a binary buffer.
+        If an LED fails with a retry policy, it is sent again on the next show.
+        """
+        for led in range(start, end):
             self.buffer[0] = _PIXELS_REGISTER + led * 4
             self.buffer[1:4] = buffer[led * 3 : (led + 1) * 3]
-            self.buffer[4] = 0xFF
-            with self.device as bus:
-                bus.write(self.buffer, end=6)
-            time.sleep(0.0008)
+            self.buffer[4] = level
+            if self._batch.send(self.buffer, 5, partial=True):
+                self._led_shadow[4 * led : 4 * led + 4] = self.buffer[1:5]
+                self._led_known |= 1 << led
+            else:
+                self._led_known &= ~(1 << led)
+            if not self._batch.depth:
+                self._settle()
+
+    def _set_led_level(self, led, level):
+        """Set the hardware brightness byte of an LED"""
+        self.buffer[0] = _PIXELS_REGISTER + led * 4 + 3
+        self.buffer[1] = level
+        if self._batch.send(self.buffer, 2, partial=True):
+            self._led_shadow[4 * led + 3] = level
+        else:
+            self._led_known &= ~(1 << led)
+        if not self._batch.depth:
+            self._settle()
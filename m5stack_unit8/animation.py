@@ -0,0 +1,225 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes, unused-argument
+"""
+`m5stack_unit8.animation`
+================================================================================
+
+Frame-paced LED animations for the pixels of the Unit8 boards.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The :py:class:`Animator` turns off ``auto_write`` on the pixels. Updates and
+effects are composed into a frame, and the frame is sent at most once per
+``1 / fps`` seconds with a single ``show()``, that only transmits the LEDs that
+changed. Brightness and gamma are applied with a precomputed lookup table.
+When the bus can't keep up, late frames are dropped rather than queued.
+
+.. code-block:: python
+
+    animator = Animator(encoder.pixels, fps=30)
+    animator.add(Wheel(range(8), positions, shift=0))
+    while True:
+        encoder.positions_into(positions)
+        animator.tick()
+"""
+
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+
+def color_table(brightness=1.0, gamma=1.0):
+    """Return a 256 bytes lookup table applying brightness and gamma to a color byte"""
+    return bytearray(
+        round(((value / 255) ** gamma) * brightness * 255) for value in range(256)
+    )
+
+
+def colorwheel(position):
+    """Return the RGB color of a position (0-255) on the color wheel, as an int"""
+    position &= 0xFF
+    if position < 85:
+        return ((255 - position * 3) << 16) | ((position * 3) << 8)
+    if position < 170:
+        position -= 85
+        return ((255 - position * 3) << 8) | (position * 3)
+    position -= 170
+    return ((position * 3) << 16) | (255 - position * 3)
+
+
+def _set_color(frame, led, color):
+    frame[3 * led] = (color >> 16) & 0xFF
+    frame[3 * led + 1] = (color >> 8) & 0xFF
+    frame[3 * led + 2] = color & 0xFF
+
+
+class Solid:
+    """Set LEDs to a color (int)."""
+
+    def __init__(self, leds, color):
+        self.leds = leds
+        self.color = color
+
+    def render(self, frame, now):
+        """Draw into the frame, return False when the effect is finished"""
+        for led in self.leds:
+            _set_color(frame, led, self.color)
+        return True
+
+
+class Fade:
+    """
+    Fade LEDs from a color to another (ints) in ``duration`` seconds,
+    starting at the first frame, and remove the effect at the end.
+    """
+
+    def __init__(self, leds, start_color, end_color, duration):
+        self.leds = leds
+        self.start_color = start_color
+        self.end_color = end_color
+        self.duration = duration
+        self._start = None
+
+    def render(self, frame, now):
+        """Draw into the frame, return False when the effect is finished"""
+        if self._start is None:
+            self._start = now
+        progress = min(256, int((now - self._start) * 256 / self.duration))
+        color = 0
+        for shift in (16, 8, 0):
+            start = (self.start_color >> shift) & 0xFF
+            end = (self.end_color >> shift) & 0xFF
+            color |= (start + (end - start) * progress // 256) << shift
+        for led in self.leds:
+            _set_color(frame, led, color)
+        return progress < 256
+
+
+class Wheel:
+    """
+    Color LEDs on the color wheel from values, like the positions of the
+    encoders or the angles of the potentiometers, updated by the caller.
+    The color of LED ``leds[i]`` is ``values[i] >> shift`` on the wheel.
+    """
+
+    def __init__(self, leds, values, shift=8, offset=0):
+        self.leds = leds
+        self.values = values
+        self.shift = shift
+        self.offset = offset
+
+    def render(self, frame, now):
+        """Draw into the frame, return False when the effect is finished"""
+        values = self.values
+        for index, led in enumerate(self.leds):
+            _set_color(
+                frame, led, colorwheel((values[index] >> self.shift) + self.offset)
+            )
+        return True
+
+
+class Animator:
+    """
+    Compose LED updates and effects and send them at most once per frame.
+
+    :param pixels: the ``pixels`` of a Unit8Encoder or Unit8Angle.
+    :param int fps: the target frames per second.
+    :param float brightness: scale applied through the lookup table.
+    :param float gamma: gamma correction applied through the lookup table.
+    """
+
+    def __init__(self, pixels, fps=30, brightness=1.0, gamma=1.0):
+        self.pixels = pixels
+        self.fps = fps
+        self.effects = []
+        self.frame = bytearray(3 * len(pixels))
+        self.frames = 0
+        self.dropped = 0
+        self._sent = None
+        self._next_time = None
+        self._brightness = brightness
+        self._gamma = gamma
+        self._table = color_table(brightness, gamma)
+        pixels.auto_write = False
+        pixels.brightness = 1.0
+
+    @property
+    def brightness(self):
+        """Brightness applied to the frames, 0.0 - 1.0"""
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        self._brightness = value
+        self._table = color_table(value, self._gamma)
+        self._sent = None
+
+    @property
+    def gamma(self):
+        """Gamma correction applied to the frames"""
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, value):
+        self._gamma = value
+        self._table = color_table(self._brightness, value)
+        self._sent = None
+
+    def add(self, effect):
+        """Add an effect, drawn over the effects added before it"""
+        self.effects.append(effect)
+        return effect
+
+    def remove(self, effect):
+        """Remove an effect"""
+        self.effects.remove(effect)
+
+    def __setitem__(self, led, color):
+        """Set an LED (int color) in the next frame"""
+        _set_color(self.frame, led, color)
+
+    def tick(self, now=None):
+        """
+        Render and send a frame if one is due, return True if a frame was sent.
+        Call it often, from the main loop.
+        """
+        if now is None:
+            now = time.monotonic()
+        if self._next_time is not None and now < self._next_time:
+            return False
+        period = 1 / self.fps
+        if self._next_time is None:
+            self._next_time = now
+        late = now - self._next_time
+        if late >= period:
+            # the frames that should have been sent in between are dropped
+            self.dropped += int(late / period)
+            self._next_time = now
+        self._next_time += period
+        frame = self.frame
+        for effect in tuple(self.effects):
+            if not effect.render(frame, now):
+                self.effects.remove(effect)
+        if frame == self._sent:
+            return False
+        table = self._table
+        pixels = self.pixels
+        for led in range(len(frame) // 3):
+            index = 3 * led
+            pixels[led] = (
+                table[frame[index]] << 16
+                | table[frame[index + 1]] << 8
+                | table[frame[index + 2]]
+            )
+        pixels.show()
+        self._sent = bytes(frame)
+        self.frames += 1
+        return True
@@ -0,0 +1,210 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes
+"""
+`m5stack_unit8.async_poller`
+================================================================================
+
+Poll a Unit8 board in an asyncio task and push change events to a queue.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The poller yields to other tasks between bus transactions. When the encoder
+board is not read in burst mode (nor in tracking mode), its channels are read
+one by one. On the angle board the delay between channels is awaited rather
+than slept, so that a full read does not block the event loop.
+
+CircuitPython's asyncio does not have ``asyncio.Queue``, a minimal queue with
+``get()``, ``get_nowait()``, ``put_nowait()``, ``empty()`` and ``full()``
+is used instead.
+
+**Software and Dependencies:**
+
+* Adafruit CircuitPython firmware for the supported boards:
+  https://circuitpython.org/downloads
+
+* Adafruit's asyncio library: https://github.com/adafruit/Adafruit_CircuitPython_asyncio
+"""
+
+import array
+import time
+import asyncio
+from m5stack_unit8.encoder import Unit8Encoder
+from m5stack_unit8.events import (
+    Event,
+    ENCODER_DELTA,
+    BUTTON_PRESS,
+    BUTTON_RELEASE,
+    KNOB_MOVED,
+    SWITCH_TOGGLE,
+)
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+
+class _Queue:
+    """Minimal queue for asyncio implementations without asyncio.Queue."""
+
+    def __init__(self, maxsize=0):
+        self._items = []
+        self._maxsize = maxsize
+        self._event = asyncio.Event()
+
+    def qsize(self):
+        """Number of items in the queue."""
+        return len(self._items)
+
+    def empty(self):
+        """Whether the queue is empty."""
+        return not self._items
+
+    def full(self):
+        """Whether the queue has maxsize items."""
+        return 0 < self._maxsize <= len(self._items)
+
+    def put_nowait(self, item):
+        """Add an item to the queue."""
+        self._items.append(item)
+        self._event.set()
+
+    def get_nowait(self):
+        """Remove and return an item from the queue, raise IndexError if empty."""
+        return self._items.pop(0)
+
+    async def get(self):
+        """Wait for an item and return it."""
+        while not self._items:
+            self._event.clear()
+            await self._event.wait()
+        return self._items.pop(0)
+
+
+def _make_queue(maxsize):
+    if hasattr(asyncio, "Queue"):
+        return asyncio.Queue(maxsize)
+    return _Queue(maxsize)
+
+
+class AsyncPoller:
+    """
+    Poll a :py:class:`~m5stack_unit8.encoder.Unit8Encoder` or
+    :py:class:`~m5stack_unit8.angle.Unit8Angle` at ``rate`` times per second
+    and put :py:class:`~m5stack_unit8.events.Event` objects in ``queue``.
+
+    Knob events are sent when an angle moved by more than ``threshold``
+    (in 16 bits units) since the last event for that knob. Events that do not
+    fit in the queue are dropped and counted in ``dropped``, read errors are
+    counted in ``errors`` and the poll is retried on the next cycle.
+    """
+
+    def __init__(self, unit, rate=100, queue=None, maxsize=32, threshold=256):
+        self.unit = unit
+        self.rate = rate
+        self.queue = _make_queue(maxsize) if queue is None else queue
+        self.threshold = threshold
+        self.dropped = 0
+        self.errors = 0
+        self._encoder = isinstance(unit, Unit8Encoder)
+        if self._encoder and unit.tracking:
+            # the tracked positions are not limited to 32 bits
+            self._values = [0] * 8
+            self._last = [0] * 8
+        else:
+            self._values = array.array("l", [0] * 8)
+            self._last = array.array("l", [0] * 8)
+        self._buttons = bytearray(8)
+        self._last_buttons = bytearray(8)
+        self._switch = None
+        self._task = None
+
+    def start(self):
+        """Start polling in a new task, return the task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def stop(self):
+        """Cancel the polling task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        """Poll forever at the configured rate."""
+        while True:
+            start = time.monotonic()
+            try:
+                await self.poll()
+            except OSError:
+                self.errors += 1
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(max(0, 1 / self.rate - elapsed))
+
+    async def poll(self):
+        """Read the board once and queue the changes."""
+        if self._encoder:
+            await self._poll_encoder()
+        else:
+            await self._poll_angle()
+        switch = self.unit.switch
+        if self._switch is not None and switch != self._switch:
+            self._emit(SWITCH_TOGGLE, -1, switch)
+        self._switch = switch
+
+    async def _poll_encoder(self):
+        unit = self.unit
+        values = self._values
+        buttons = self._buttons
+        valid_values = valid_buttons = 0xFF
+        if unit.burst or unit.tracking:
+            unit.positions_into(values)
+            valid_values = unit.valid
+            await asyncio.sleep(0)
+            unit.buttons_into(buttons)
+            valid_buttons = unit.valid
+            await asyncio.sleep(0)
+        else:
+            for num in range(8):
+                values[num] = unit.get_position(num)
+                await asyncio.sleep(0)
+            for num in range(8):
+                buttons[num] = unit.get_button(num)
+                await asyncio.sleep(0)
+        first = self._switch is None
+        for num in range(8):
+            # skip the channels that could not be read
+            bit = 1 << num
+            if valid_values & bit and values[num] != self._last[num]:
+                if not first:
+                    self._emit(ENCODER_DELTA, num, values[num] - self._last[num])
+                self._last[num] = values[num]
+            if valid_buttons & bit and buttons[num] != self._last_buttons[num]:
+                if not first:
+                    kind = BUTTON_PRESS if buttons[num] else BUTTON_RELEASE
+                    self._emit(kind, num, bool(buttons[num]))
+                self._last_buttons[num] = buttons[num]
+
+    async def _poll_angle(self):
+        unit = self.unit
+        first = self._switch is None
+        for num in range(8):
+            value = unit.get_angle(num)
+            await asyncio.sleep(unit.delay)
+            if first:
+                self._last[num] = value
+            elif abs(value - self._last[num]) > self.threshold:
+                self._emit(KNOB_MOVED, num, value)
+                self._last[num] = value
+
+    def _emit(self, kind, channel, value):
+        if self.queue.full():
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(Event(kind, channel, value, time.monotonic()))
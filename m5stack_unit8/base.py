@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments, no-member
+# pylint: disable=attribute-defined-outside-init
+"""
+`m5stack_unit8.base`
+================================================================================
+
+The bus access shared by the Unit8 Encoder and Unit8 Angle drivers: retried
+transactions, reads of the 8 channels of a register block, instrumentation,
+address change and batched writes.
+
+
+* Author(s): Neradoc
+"""
+
+import time
+from micropython import const
+from m5stack_unit8.retry import transfer
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+_ADDRESS_REGISTER = const(0xFF)
+
+
+class Unit8Base:
+    """
+    Base class of the drivers. Subclasses provide ``device``, ``register``,
+    ``buffer``, ``retry``, ``valid``, ``_batch`` and ``_led_known``.
+    """
+
+    # read the 8 channels of a block in one transaction
+    burst = False
+    # time to wait between transactions
+    delay = 0
+
+    def _settle(self):
+        """Wait between two transactions."""
+        if self.delay:
+            time.sleep(self.delay)
+
+    def _deadline(self):
+        """When the operation starting now stops retrying, None without policy."""
+        return None if self.retry is None else self.retry.deadline()
+
+    def _backoff(self, attempt, deadline, error=None):
+        """
+        Wait before retrying a failed transaction, False if it should not be.
+        ``error`` is the OSError of the transaction, for the drivers' policies.
+        """
+        del error  # unused by the retry policy
+        return self.retry is not None and self.retry.wait(attempt, deadline)
+
+    def _read(self, bus, register, buffer, start, end, deadline=None, partial=False):
+        """
+        Write the register address then read into the buffer, retrying failures.
+        Return False if it still failed and ``partial`` results are allowed.
+        """
+        return transfer(self, bus, buffer, start, end, register, deadline, partial)
+
+    def _write(self, bus, buffer, end, deadline=None, partial=False):
+        """
+        Write the buffer up to end, retrying failures.
+        Return False if it still failed and ``partial`` results are allowed.
+        """
+        return transfer(self, bus, buffer, 0, end, None, deadline, partial)
+
+    def _read_channels(self, bus, register, width, deadline=None, fill=0):
+        """
+        Read the 8 channels of a register block into the buffer,
+        update ``valid`` with the channels that could be read.
+        The channels that could not be read are filled with ``fill``.
+        """
+        if deadline is None:
+            deadline = self._deadline()
+        self.valid = 0xFF
+        buffer = self.buffer
+        # if the burst read fails, fall back to reading channel by channel
+        if self.burst and self._read(
+            bus, register, buffer, 0, 8 * width, deadline, True
+        ):
+            return
+        if self._sweep(register, width):
+            return
+        for num in range(8):
+            start = num * width
+            if not self._read(
+                bus, register + start, buffer, start, start + width, deadline, True
+            ):
+                self.valid &= ~(1 << num)
+                for index in range(start, start + width):
+                    buffer[index] = fill
+            self._settle()
+
+    def _sweep(self, register, width):
+        """
+        Read the 8 channels one by one in a single combined transaction, if the
+        bus can (see :py:class:`~m5stack_unit8.i2cdev.I2CDev`) and there is no delay.
+        """
+        if self.delay or getattr(self.device.i2c, "sweep", None) is None:
+            return False
+        try:
+            if hasattr(self.device, "sweep"):
+                # an InstrumentedDevice records the channels
+                self.device.sweep(register, width, 8, self.buffer)
+            else:
+                self.device.i2c.sweep(
+                    self.device.device_address, register, width, 8, self.buffer
+                )
+        except OSError:
+            return False
+        return True
+
+    def set_address(self, address):
+        """
+        Change the I2C address of the board and use the new address.
+        The board keeps it after a power cycle.
+        """
+        if address not in range(0x08, 0x78):
+            raise ValueError("address must be 0x08-0x77")
+        self.buffer[0] = _ADDRESS_REGISTER
+        self.buffer[1] = address
+        with self.device as bus:
+            self._write(bus, self.buffer, 2)
+        self.device.device_address = address
+
+    def batch(self):
+        """
+        Return a context manager that queues the writes made inside it,
+        and sends them merged under one lock at the end,
+        see :py:class:`~m5stack_unit8.batch.WriteBatch`.
+        """
+        return self._batch
+
+    def _forget_writes(self):
+        """Queued writes were lost, the shadow can't be trusted anymore"""
+        self._led_known = 0
+
+    def instrument(self, *hooks):
+        """
+        Record every bus transaction of the driver, see :py:meth:`stats`.
+        The hooks are called for each transaction with
+        ``(register, is_write, count, duration_us, error)``.
+        """
+        # pylint: disable=import-outside-toplevel
+        from m5stack_unit8.stats import instrument
+
+        self.device = instrument(self.device, hooks)
+
+    def stats(self, reset=False):
+        """
+        The counters and latency histograms of the transactions by register,
+        as a dict, or None if :py:meth:`instrument` was not called.
+        Clear the counters after reading them if ``reset`` is True.
+        """
+        stats = getattr(self.device, "stats", None)
+        return None if stats is None else stats.as_dict(reset)
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=protected-access
+"""
+`m5stack_unit8.batch`
+================================================================================
+
+Deferred register writes, see the ``batch()`` method of the drivers.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+Queued writes go into an image of the registers, so a register written twice
+is only sent once with its last value. They are sent in the order of the
+registers: a driver cancels the queued writes that a later write to other
+registers overrides (a position and the reset of the same encoder). On flush, consecutive registers are sent
+in one transaction, all under a single lock of the device. ``regions`` lists
+``(first, last, width)`` blocks of registers where a write must not cross a
+``width`` boundary, because the firmware doesn't auto-increment the register
+address past it.
+
+.. code-block:: python
+
+    with encoder.batch():
+        encoder.reset()
+        for led in range(9):
+            encoder.set_led(led, 0x000020)
+"""
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+
+class WriteBatch:
+    """
+    The deferred writes of a driver, used as a (reentrant) context manager.
+    Writes are queued while inside, and flushed when leaving the outer one.
+
+    :param unit: the driver, providing ``device`` and ``_write()``.
+    :param int size: the number of registers that can be queued.
+    :param tuple regions: ``(first, last, width)`` register blocks.
+    :param settle: a function called after each transaction, or None.
+    """
+
+    def __init__(self, unit, size, regions=(), settle=None):
+        self.unit = unit
+        self.regions = regions
+        self.settle = settle
+        self.depth = 0
+        self.transactions = 0
+        self._image = bytearray(size)
+        self._dirty = bytearray(size)
+        self._low = size
+        self._high = 0
+        self._buffer = bytearray(1 + size)
+
+    def __enter__(self):
+        self.depth += 1
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.depth -= 1
+        if self.depth == 0:
+            if exception_type is None:
+                self.flush()
+            else:
+                self.discard()
+
+    def send(self, buffer, end, partial=False):
+        """
+        Write the register address in ``buffer[0]`` followed by the data up to
+        end, or queue it if inside a batch. Return the result of ``_write``.
+        """
+        if not self.depth:
+            with self.unit.device as bus:
+                return self.unit._write(bus, buffer, end, partial=partial)
+        register = buffer[0]
+        image = self._image
+        dirty = self._dirty
+        for index in range(1, end):
+            image[register + index - 1] = buffer[index]
+            dirty[register + index - 1] = 1
+        self._low = min(self._low, register)
+        self._high = max(self._high, register + end - 1)
+        return True
+
+    def cancel(self, register, count):
+        """
+        Drop the queued writes to ``count`` registers from ``register``,
+        when a later write to other registers overrides their effect.
+        """
+        dirty = self._dirty
+        for index in range(register, register + count):
+            dirty[index] = 0
+
+    def _run_end(self, register):
+        """The end (excluded) of the transaction starting at a dirty register"""
+        dirty = self._dirty
+        limit = len(dirty)
+        for first, last, width in self.regions:
+            if first <= register < last:
+                limit = min(last, register + width - (register - first) % width)
+                break
+        end = register + 1
+        while end < limit and dirty[end]:
+            end += 1
+        return end
+
+    def flush(self):
+        """
+        Send the queued writes under one lock, return the number of transactions.
+        If a write fails, the rest is dropped and the driver forgets its shadows.
+        """
+        if self._low >= self._high:
+            return 0
+        unit = self.unit
+        dirty = self._dirty
+        buffer = self._buffer
+        count = 0
+        try:
+            with unit.device as bus:
+                register = self._low
+                while register < self._high:
+                    if not dirty[register]:
+                        register += 1
+                        continue
+                    end = self._run_end(register)
+                    buffer[0] = register
+                    buffer[1 : 1 + end - register] = self._image[register:end]
+                    unit._write(bus, buffer, 1 + end - register)
+                    count += 1
+                    if self.settle:
+                        self.settle()
+                    register = end
+        except OSError:
+            self.discard()
+            raise
+        finally:
+            self.transactions += count
+        self._clear()
+        return count
+
+    def discard(self):
+        """Drop the queued writes, the driver forgets what it expected them to set"""
+        if self._low < self._high:
+            self._clear()
+            self.unit._forget_writes()
+
+    def _clear(self):
+        dirty = self._dirty
+        for index in range(self._low, self._high):
+            dirty[index] = 0
+        self._low = len(dirty)
+        self._high = 0
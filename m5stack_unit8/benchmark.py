@@ -0,0 +1,201 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, import-outside-toplevel
+"""
+`m5stack_unit8.benchmark`
+================================================================================
+
+Measure the cost of the driver operations on emulated boards.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+For each operation this reports, per call: the number of transactions, the
+bytes on the wire (including the address byte of each transaction), the
+modeled bus time at 100kHz and 400kHz (9 bits per byte plus start and stop),
+the wall and CPU time, and the bytes allocated (``gc.mem_alloc()`` on
+CircuitPython, the ``tracemalloc`` peak of one call on CPython).
+
+Run it with ``python -m m5stack_unit8.benchmark``, ``--json`` prints the
+results as JSON, ``--compare FILE`` exits with an error if the transactions
+or bytes of an operation grew compared to a previous JSON output.
+"""
+
+import gc
+import time
+from m5stack_unit8.angle import Unit8Angle
+from m5stack_unit8.encoder import Unit8Encoder
+from m5stack_unit8.emulator import FakeI2C, Unit8AngleEmulator, Unit8EncoderEmulator
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+FREQUENCIES = (100_000, 400_000)
+# start and stop conditions, and the address byte
+_TRANSACTION_BITS = 2 + 9
+_BYTE_BITS = 9
+
+
+def _colors(i):
+    # alternate colors so that LED writes are not skipped as unchanged
+    return 0x102030 if i % 2 else 0x302010
+
+
+def _set_last_pixel(pixels, i):
+    pixels[8] = _colors(i)
+
+
+def encoder_operations(encoder):
+    """The benchmarked operations of a Unit8Encoder, by name"""
+    state = encoder.snapshot()
+    return {
+        "encoder.positions": lambda i: encoder.positions,
+        "encoder.increments": lambda i: encoder.increments,
+        "encoder.buttons": lambda i: encoder.buttons,
+        "encoder.switch": lambda i: encoder.switch,
+        "encoder.snapshot": lambda i: encoder.snapshot(state),
+        "encoder.set_led": lambda i: encoder.set_led(i % 9, _colors(i)),
+        "encoder.get_led": lambda i: encoder.get_led(i % 9),
+        "encoder.pixels.fill": lambda i: encoder.pixels.fill(_colors(i)),
+        "encoder.pixels[8]": lambda i: _set_last_pixel(encoder.pixels, i),
+        "encoder.reset": lambda i: encoder.reset(),
+    }
+
+
+def angle_operations(angle):
+    """The benchmarked operations of a Unit8Angle, by name"""
+    state = angle.snapshot()
+    return {
+        "angle.angles": lambda i: angle.angles,
+        "angle.angles_12bit": lambda i: angle.angles_12bit,
+        "angle.angles_8bit": lambda i: angle.angles_8bit,
+        "angle.switch": lambda i: angle.switch,
+        "angle.snapshot": lambda i: angle.snapshot(state),
+        "angle.set_led": lambda i: angle.set_led(i % 9, _colors(i)),
+        "angle.get_led": lambda i: angle.get_led(i % 9),
+        "angle.pixels.fill": lambda i: angle.pixels.fill(_colors(i)),
+        "angle.pixels[8]": lambda i: _set_last_pixel(angle.pixels, i),
+    }
+
+
+def _allocated(operation, index):
+    """Bytes allocated by one call of the operation"""
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        operation(index)
+        allocated = gc.mem_alloc() - before
+        gc.enable()
+        return allocated
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    operation(index)
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return allocated
+
+
+def measure(bus, operation, repeat=100):
+    """Run an operation ``repeat`` times on the bus, return its cost per call"""
+    operation(-1)
+    bus.reset_counters()
+    wall_start = time.monotonic()
+    cpu_start = time.process_time() if hasattr(time, "process_time") else wall_start
+    for index in range(repeat):
+        operation(index)
+    wall_time = time.monotonic() - wall_start
+    if hasattr(time, "process_time"):
+        cpu_time = time.process_time() - cpu_start
+    else:
+        cpu_time = wall_time
+    transactions = bus.transactions / repeat
+    data_bytes = (bus.bytes_written + bus.bytes_read) / repeat
+    bits = transactions * _TRANSACTION_BITS + data_bytes * _BYTE_BITS
+    result = {
+        "transactions": transactions,
+        "bytes": transactions + data_bytes,
+        "wall_time": wall_time / repeat,
+        "cpu_time": cpu_time / repeat,
+        "allocated": _allocated(operation, repeat),
+    }
+    for frequency in FREQUENCIES:
+        result[f"bus_time_{frequency // 1000}khz"] = bits / frequency
+    return result
+
+
+def run(repeat=100, auto_increment=True):
+    """Run all the benchmarks, return a dict of results by operation name"""
+    encoder_board = Unit8EncoderEmulator(auto_increment=auto_increment)
+    angle_board = Unit8AngleEmulator(auto_increment=auto_increment)
+    bus = FakeI2C(encoder_board, angle_board)
+    operations = {}
+    operations.update(encoder_operations(Unit8Encoder(bus)))
+    operations.update(angle_operations(Unit8Angle(bus)))
+    return {name: measure(bus, op, repeat) for name, op in operations.items()}
+
+
+def compare(results, baseline):
+    """Return the names of the operations whose bus cost grew from the baseline"""
+    worse = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key in ("transactions", "bytes"):
+            if result[key] > baseline[name][key]:
+                worse.append(name)
+                break
+    return worse
+
+
+def _print_table(results):
+    print(
+        f"{'operation':<22} {'trans':>6} {'bytes':>6} {'100kHz':>8} {'400kHz':>8} {'cpu':>8} {'alloc':>6}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<22} {result['transactions']:>6.1f} {result['bytes']:>6.1f}"
+            f" {result['bus_time_100khz'] * 1000:>6.2f}ms"
+            f" {result['bus_time_400khz'] * 1000:>6.2f}ms"
+            f" {result['cpu_time'] * 1000:>6.2f}ms"
+            f" {result['allocated'] if result['allocated'] is not None else '-':>6}"
+        )
+
+
+def main(args=None):
+    """Command line entry point"""
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[4])
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--no-auto-increment", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="JSON results to compare to")
+    options = parser.parse_args(args)
+    results = run(options.repeat, not options.no_auto_increment)
+    if options.json:
+        print(json.dumps(results, indent=1))
+    else:
+        _print_table(results)
+    if options.compare:
+        with open(options.compare) as file:
+            worse = compare(results, json.load(file))
+        if worse:
+            print("Regressions:", ", ".join(worse), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+"""
+`m5stack_unit8.bus_manager`
+================================================================================
+
+Share one I2C bus between several Unit8 boards, some of them possibly behind
+a TCA9548A style I2C multiplexer.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The manager owns the multiplexer: it only writes the channel selection when it
+changes, which is why the boards must be created on the main bus, not on the
+channel objects of a multiplexer driver (those select their channel on every
+transaction). The channels are deselected before reading a board on the main
+bus, so that a board at the same address behind the multiplexer doesn't answer.
+
+The drivers talk to their board when they are created, so the channel of a
+board behind the multiplexer must be selected with :py:meth:`BusManager.select`
+before creating it.
+
+A board that fails to be read (unplugged for example) is counted in ``errors``
+and read again at its next period, the other boards are still read.
+
+.. code-block:: python
+
+    manager = BusManager(board.I2C())
+    manager.add(Unit8Encoder(board.I2C()), name="main")
+    manager.select(2)
+    manager.add(Unit8Angle(board.I2C()), name="knobs", channel=2)
+    while True:
+        for name in manager.poll():
+            print(name, manager.states[name])
+
+Boards of the same type have the same default address, use
+:py:meth:`BusManager.change_address` (connecting one board at a time, or on
+different multiplexer channels) to give each of them its own address.
+
+**Software and Dependencies:**
+
+* Adafruit CircuitPython firmware for the supported boards:
+  https://circuitpython.org/downloads
+
+* Adafruit's Bus Device library: https://github.com/adafruit/Adafruit_CircuitPython_BusDevice
+"""
+
+import time
+from adafruit_bus_device.i2c_device import I2CDevice
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+_DEFAULT_MUX_ADDRESS = 0x70
+
+
+class _Entry:
+    """A registered board and its schedule."""
+
+    __slots__ = ("name", "unit", "channel", "period", "priority", "next_time", "state")
+
+    def __init__(self, name, unit, channel, period, priority):
+        self.name = name
+        self.unit = unit
+        self.channel = channel
+        self.period = period
+        self.priority = priority
+        self.next_time = 0
+        self.state = None
+
+
+class BusManager:
+    """
+    Schedule the reads of several :py:class:`~m5stack_unit8.encoder.Unit8Encoder`
+    and :py:class:`~m5stack_unit8.angle.Unit8Angle` on a shared bus.
+
+    Each board is read with its ``snapshot()`` at its own rate. When several
+    boards are due, the reads are grouped by multiplexer channel, the group
+    with the highest priority board going first, and by priority inside a group.
+
+    :param i2c: the bus the boards and multiplexer are on.
+    :param int mux_address: the address of the multiplexer, if any.
+    """
+
+    def __init__(self, i2c, mux_address=_DEFAULT_MUX_ADDRESS):
+        self.i2c = i2c
+        self.mux_address = mux_address
+        self.switches = 0
+        """Number of multiplexer channel changes, for statistics."""
+        self.errors = 0
+        """Number of failed reads (or channel changes)."""
+        self.last_error = None
+        self._mux = None
+        self._channel = None
+        self._mux_buffer = bytearray(1)
+        self._entries = {}
+
+    def add(self, unit, name=None, channel=None, rate=50, priority=0):
+        """
+        Register a board, return its name.
+
+        :param unit: the Unit8Encoder or Unit8Angle.
+        :param name: the key of its state in :py:attr:`states`,
+          defaults to the class name, address and channel.
+        :param int channel: the multiplexer channel it is on, None if on the bus.
+        :param float rate: the number of reads per second.
+        :param int priority: higher priority boards are read first.
+        """
+        if channel is not None and channel not in range(8):
+            raise ValueError("channel must be one of 0-7 or None")
+        if name is None:
+            name = f"{type(unit).__name__}-{unit.device.device_address:02x}"
+            if channel is not None:
+                name += f"-{channel}"
+        if name in self._entries:
+            raise ValueError(f"{name} is already registered")
+        self._entries[name] = _Entry(name, unit, channel, 1 / rate, priority)
+        return name
+
+    def remove(self, name):
+        """Unregister a board."""
+        del self._entries[name]
+
+    def unit(self, name):
+        """Return the board registered with that name."""
+        return self._entries[name].unit
+
+    @property
+    def states(self):
+        """
+        A dict of the last state read from each board, by name. The channels
+        that could not be read are cleared in the ``valid`` bitmask of a state,
+        their values must be skipped.
+        """
+        return {name: entry.state for name, entry in self._entries.items()}
+
+    def select(self, channel):
+        """
+        Select a multiplexer channel, unless it is already selected.
+        None deselects all the channels, for the boards on the main bus.
+        """
+        if channel == self._channel:
+            return
+        if self._mux is None:
+            self._mux = I2CDevice(self.i2c, self.mux_address)
+        self._mux_buffer[0] = 0 if channel is None else 1 << channel
+        with self._mux as bus:
+            bus.write(self._mux_buffer)
+        self._channel = channel
+        self.switches += 1
+
+    def change_address(self, name, address):
+        """Change the I2C address of a registered board."""
+        entry = self._entries[name]
+        self.select(entry.channel)
+        entry.unit.set_address(address)
+
+    def poll(self, now=None, budget=None):
+        """
+        Read the boards that are due, return the list of the names of those
+        that were read. A board that fails is rescheduled like the others.
+
+        :param float now: the current ``time.monotonic()``.
+        :param float budget: stop reading boards after that many seconds,
+          the remaining ones stay due for the next poll.
+        """
+        if now is None:
+            now = time.monotonic()
+        due = [entry for entry in self._entries.values() if entry.next_time <= now]
+        if not due:
+            return []
+        group_priority = {}
+        for entry in due:
+            best = group_priority.get(entry.channel, entry.priority)
+            group_priority[entry.channel] = max(best, entry.priority)
+        due.sort(
+            key=lambda entry: (
+                -group_priority[entry.channel],
+                # stay on the current channel when possible
+                entry.channel != self._channel,
+                -1 if entry.channel is None else entry.channel,
+                -entry.priority,
+            )
+        )
+        done = []
+        start = time.monotonic()
+        for entry in due:
+            if budget is not None and done and time.monotonic() - start > budget:
+                break
+            try:
+                self.select(entry.channel)
+                entry.state = entry.unit.snapshot(entry.state)
+                done.append(entry.name)
+            except OSError as error:
+                self.errors += 1
+                self.last_error = error
+            entry.next_time += entry.period
+            if entry.next_time <= now:
+                # fell behind, skip the missed reads
+                entry.next_time = now + entry.period
+        return done
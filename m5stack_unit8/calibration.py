@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+"""
+`m5stack_unit8.calibration`
+================================================================================
+
+Calibration of the potentiometers of the Unit8 Angle, see
+:py:meth:`~m5stack_unit8.angle.Unit8Angle.set_calibration`.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+A calibration is compiled into a lookup table of 4096 16 bits values, indexed
+by the raw 12 bits value of a potentiometer, so that scaling a sample is a
+single lookup. Tables take 8kB each and are shared between the knobs (and
+boards) that use identical calibrations.
+
+.. code-block:: python
+
+    angle.set_calibration(0, Calibration(minimum=40, maximum=4060, taper=TAPER_LOG))
+"""
+
+import array
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+TAPER_LINEAR = "linear"
+TAPER_LOG = "log"
+TAPERS = (TAPER_LINEAR, TAPER_LOG)
+
+_RAW_MAX = 0xFFF
+_OUT_MAX = 0xFFFF
+# the log taper covers 40dB
+_LOG_RANGE = 100
+
+_tables = {}
+
+
+class Calibration:
+    """
+    How the raw 12 bits values (0-4095) of a potentiometer map to 0-65535.
+
+    :param int minimum: the raw value measured at one end of the course.
+    :param int maximum: the raw value measured at the other end.
+    :param int dead_zone: raw values within that distance of an end map to it.
+    :param bool invert: reverse the direction of the potentiometer.
+    :param str taper: ``TAPER_LINEAR`` or ``TAPER_LOG`` (audio taper).
+    """
+
+    def __init__(
+        self, minimum=0, maximum=_RAW_MAX, dead_zone=0, invert=False, taper=TAPER_LINEAR
+    ):
+        if not 0 <= minimum < maximum <= _RAW_MAX:
+            raise ValueError("expected 0 <= minimum < maximum <= 4095")
+        if not 0 <= 2 * dead_zone < maximum - minimum:
+            raise ValueError("dead_zone is larger than the course")
+        if taper not in TAPERS:
+            raise ValueError(f"taper must be one of {TAPERS}")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.dead_zone = dead_zone
+        self.invert = bool(invert)
+        self.taper = taper
+
+    @property
+    def key(self):
+        """A tuple identifying the calibration, equal for identical calibrations"""
+        return (self.minimum, self.maximum, self.dead_zone, self.invert, self.taper)
+
+    def scale(self, raw):
+        """Return the calibrated value (0-65535) of a raw value"""
+        low = self.minimum + self.dead_zone
+        high = self.maximum - self.dead_zone
+        raw = min(max(raw, low), high)
+        if self.invert:
+            # reverse the course before the taper
+            raw = low + high - raw
+        if self.taper == TAPER_LOG:
+            ratio = (raw - low) / (high - low)
+            value = round((_LOG_RANGE**ratio - 1) * _OUT_MAX / (_LOG_RANGE - 1))
+        else:
+            value = (raw - low) * _OUT_MAX // (high - low)
+        return value
+
+    def table(self):
+        """Compute the lookup table of the calibration, an ``array("H")``"""
+        return array.array("H", (self.scale(raw) for raw in range(_RAW_MAX + 1)))
+
+
+DEFAULT = Calibration()
+
+
+def table_for(calibration=None):
+    """
+    Return the lookup table of a calibration (or the default one), shared with
+    the previous calls for an identical calibration.
+    """
+    if calibration is None:
+        calibration = DEFAULT
+    key = calibration.key
+    if key not in _tables:
+        _tables[key] = calibration.table()
+    return _tables[key]
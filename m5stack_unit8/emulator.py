@@ -0,0 +1,298 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes
+"""
+`m5stack_unit8.emulator`
+================================================================================
+
+Emulate Unit8 boards on a fake I2C bus, to run the drivers without hardware.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+:py:class:`FakeI2C` has the methods of ``busio.I2C`` used by ``I2CDevice``
+and can be passed to the drivers in place of the board's I2C bus.
+It counts transactions and bytes, models the time they take on the bus
+from a per-transaction and a per-byte latency (optionally sleeping for it),
+and can fail transactions like a NACK would.
+
+.. code-block:: python
+
+    from m5stack_unit8.emulator import FakeI2C, Unit8EncoderEmulator
+    from m5stack_unit8.encoder import Unit8Encoder
+
+    board = Unit8EncoderEmulator()
+    encoder = Unit8Encoder(FakeI2C(board))
+    board.turn(2, 5)
+    print(encoder.positions)
+"""
+
+import errno
+import random
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+
+def _pack_int32(memory, index, value):
+    memory[index : index + 4] = (value & 0xFFFFFFFF).to_bytes(4, "little")
+
+
+def _unpack_int32(memory, index):
+    value = int.from_bytes(memory[index : index + 4], "little")
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+class _Emulator:
+    """
+    Register map of a board: writes set the register pointer and the following
+    registers, reads return the registers from the pointer. Without
+    ``auto_increment``, reads past the addressed register wrap around it.
+    """
+
+    # (first, last + 1, width) of the registers
+    _REGIONS = ()
+
+    def __init__(self, address, auto_increment=True):
+        self.address = address
+        self.auto_increment = auto_increment
+        self.memory = bytearray(256)
+        self.pointer = 0
+
+    def _register(self, index):
+        """Return the index of the nth byte accessed from the pointer"""
+        if self.auto_increment:
+            return (self.pointer + index) & 0xFF
+        for first, last, width in self._REGIONS:
+            if first <= self.pointer < last:
+                base = self.pointer - (self.pointer - first) % width
+                return base + (self.pointer - base + index) % width
+        return self.pointer
+
+    def write(self, data):
+        """Handle a write transaction"""
+        if not data:
+            return
+        self.pointer = data[0]
+        for index in range(1, len(data)):
+            self._write_register((self.pointer + index - 1) & 0xFF, data[index])
+
+    def _write_register(self, register, value):
+        if register == 0xFF:
+            self.address = value
+        else:
+            self.memory[register] = value
+
+    def read(self, buffer, start, end):
+        """Handle a read transaction"""
+        for index in range(end - start):
+            buffer[start + index] = self.memory[self._register(index)]
+        self._after_read(end - start)
+
+    def _after_read(self, count):
+        pass
+
+
+class Unit8EncoderEmulator(_Emulator):
+    """Emulate the registers of the Unit8 Encoder board."""
+
+    _REGIONS = ((0x00, 0x40, 4), (0x40, 0x70, 1), (0x70, 0x8B, 3))
+
+    def __init__(self, address=0x41, auto_increment=True):
+        super().__init__(address, auto_increment)
+        # buttons are active low
+        self.memory[0x50:0x58] = b"\x01" * 8
+
+    def turn(self, num, steps):
+        """Turn an encoder by a number of steps"""
+        _pack_int32(self.memory, 4 * num, _unpack_int32(self.memory, 4 * num) + steps)
+        index = 0x20 + 4 * num
+        _pack_int32(self.memory, index, _unpack_int32(self.memory, index) + steps)
+
+    def position(self, num):
+        """The position of an encoder"""
+        return _unpack_int32(self.memory, 4 * num)
+
+    def press(self, num, pressed=True):
+        """Press or release a button"""
+        self.memory[0x50 + num] = 0 if pressed else 1
+
+    def set_switch(self, value):
+        """Set the switch on or off"""
+        self.memory[0x60] = 1 if value else 0
+
+    def led(self, num):
+        """The (r, g, b) color of an LED"""
+        return tuple(self.memory[0x70 + 3 * num : 0x73 + 3 * num])
+
+    def _write_register(self, register, value):
+        if 0x40 <= register < 0x48:
+            if value:
+                _pack_int32(self.memory, 4 * (register - 0x40), 0)
+        else:
+            super()._write_register(register, value)
+
+    def _after_read(self, count):
+        # increments are reset to 0 after read
+        for index in range(count):
+            register = self._register(index)
+            if 0x20 <= register < 0x40:
+                register -= register % 4
+                self.memory[register : register + 4] = bytes(4)
+
+
+class Unit8AngleEmulator(_Emulator):
+    """Emulate the registers of the Unit8 Angle board."""
+
+    _REGIONS = ((0x00, 0x10, 2), (0x10, 0x21, 1), (0x30, 0x54, 4))
+
+    def __init__(self, address=0x43, auto_increment=True):
+        super().__init__(address, auto_increment)
+
+    def set_angle(self, num, value):
+        """Set the raw 12 bits value of a potentiometer"""
+        self.memory[2 * num : 2 * num + 2] = value.to_bytes(2, "little")
+        self.memory[0x10 + num] = value >> 4
+
+    def set_switch(self, value):
+        """Set the switch on or off"""
+        self.memory[0x20] = 1 if value else 0
+
+    def led(self, num):
+        """The (r, g, b, brightness) of an LED"""
+        return tuple(self.memory[0x30 + 4 * num : 0x34 + 4 * num])
+
+
+class FakeI2C:
+    """
+    A fake I2C bus with emulated boards.
+
+    :param devices: the emulated boards on the bus.
+    :param float transaction_latency: modeled time of a transaction in seconds,
+      for the start, address and stop.
+    :param float byte_latency: modeled time to transfer one byte in seconds.
+    :param bool realtime: sleep for the modeled time of each transaction.
+    :param float nack_rate: probability of any transaction to fail.
+
+    Failed transactions raise ``OSError`` with ``EIO``, transactions to an
+    address without a board raise it with ``ENODEV``.
+    """
+
+    def __init__(
+        self,
+        *devices,
+        transaction_latency=0.0,
+        byte_latency=0.0,
+        realtime=False,
+        nack_rate=0.0,
+    ):
+        self.devices = list(devices)
+        self.transaction_latency = transaction_latency
+        self.byte_latency = byte_latency
+        self.realtime = realtime
+        self.nack_rate = nack_rate
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.bus_time = 0.0
+        self.errors = 0
+        self._fail = 0
+        self._locked = False
+
+    def reset_counters(self):
+        """Set the transactions, bytes and time counters to 0"""
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.bus_time = 0.0
+        self.errors = 0
+
+    def fail_next(self, count=1):
+        """Make the next ``count`` transactions fail"""
+        self._fail += count
+
+    def try_lock(self):
+        """Lock the bus if it is not locked"""
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        """Unlock the bus"""
+        self._locked = False
+
+    def deinit(self):
+        """Nothing to release"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.deinit()
+
+    def scan(self):
+        """The addresses of the emulated boards"""
+        return sorted(device.address for device in self.devices)
+
+    def _transaction(self, address, count):
+        """Account for a transaction, return the device or raise"""
+        self.transactions += 1
+        duration = self.transaction_latency + count * self.byte_latency
+        self.bus_time += duration
+        if self.realtime and duration:
+            time.sleep(duration)
+        device = None
+        for candidate in self.devices:
+            if candidate.address == address:
+                device = candidate
+        if device is None:
+            self.errors += 1
+            raise OSError(errno.ENODEV, "No such device")
+        nack = False
+        if self._fail:
+            self._fail -= 1
+            nack = True
+        elif self.nack_rate and random.random() < self.nack_rate:
+            nack = True
+        if nack:
+            self.errors += 1
+            raise OSError(errno.EIO, "Input/output error")
+        return device
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        """Write to a board"""
+        if end is None:
+            end = len(buffer)
+        device = self._transaction(address, end - start)
+        self.bytes_written += end - start
+        device.write(bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        """Read from a board"""
+        if end is None:
+            end = len(buffer)
+        device = self._transaction(address, end - start)
+        self.bytes_read += end - start
+        device.read(buffer, start, end)
+
+    def writeto_then_readfrom(
+        self,
+        address,
+        buffer_out,
+        buffer_in,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None,
+    ):
+        """Write then read with a repeated start, counted as two transactions"""
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
@@ -2,7 +2,8 @@
 # SPDX-License-Identifier: MIT
 #
 # pylint: disable=line-too-long, superfluous-parens, protected-access
-# pylint: disable=too-few-public-methods, too-many-arguments
+# pylint: disable=too-few-public-methods, too-many-arguments, too-many-instance-attributes
+# pylint: disable=too-many-public-methods
 """
 `m5stack_unit8.encoder`
 ================================================================================
@@ -18,6 +19,29 @@ Implementation Notes
 Dev notes: the board expects a stop between write and read rather than a real restart,
 so we cannot use "write_then_readinto", but a write followed by a read.
 
+Transactions that fail with an OSError are retried according to the ``retry``
+policy (a :py:class:`~m5stack_unit8.retry.RetryPolicy`), if any. A read of all
+the channels then retries only the failed channel, and if it still fails, the
+operation returns partial results: the channel's value is 0 (a released button)
+and its bit is cleared in the ``valid`` bitmask. The values of those channels
+are not readings, users of the results must skip them.
+
+If the firmware auto-increments the register address on reads, all 8 channels of
+a register block are read in one transaction ("burst" mode). This is probed when
+the driver is created, by writing a marker to encoder 1 and restoring it, unless
+``burst`` is passed explicitly. Otherwise, on a bus that can combine transactions
+(:py:class:`~m5stack_unit8.i2cdev.I2CDev`), the channels are read one by one in a
+single combined transaction.
+
+Writes made inside ``with encoder.batch():`` are queued and sent when leaving
+it, merging consecutive registers (across channels in burst mode) and dropping
+the writes that were overwritten, see :py:class:`~m5stack_unit8.batch.WriteBatch`.
+
+With ``tracking=True``, only the increment registers are read: the positions are
+accumulated on the host, and setting them or resetting them doesn't use the bus.
+They are resynchronized with the positions of the board by :py:meth:`Unit8Encoder.resync`,
+on demand or every ``resync_interval`` seconds.
+
 **Hardware:**
 
 * M5Stack 8-Encoder Unit (STM32F030): https://shop.m5stack.com/products/8-encoder-unit-stm32f030
@@ -31,10 +55,14 @@ so we cannot use "write_then_readinto", but a write followed by a read.
 * Adafruit's Register library: https://github.com/adafruit/Adafruit_CircuitPython_Register
 """
 
+import array
 import struct
+import time
 from micropython import const
 from adafruit_bus_device.i2c_device import I2CDevice
 from adafruit_pixelbuf import PixelBuf
+from m5stack_unit8.batch import WriteBatch
+from m5stack_unit8.base import Unit8Base
 
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
@@ -44,12 +72,45 @@ _ENCODER_REGISTER = const(0x00)
 _INCREMENT_REGISTER = const(0x20)
 _ENCODER_RESET_REGISTER = const(0x40)
 _BUTTONS_REGISTER = const(0x50)
+# the buttons are active low
+_RELEASED = const(1)
 _SWITCH_REGISTER = const(0x60)
 _PIXELS_REGISTER = const(0x70)
 
+_PROBE_POSITION = const(0x1A2B3C4D)
+# unchanged LEDs between two changed ones are rewritten rather than starting a
+# new transaction when there are at most that many of them
+_LED_MERGE_GAP = const(1)
+# registers that can be written, and their layout without auto-increment
+# (the LEDs have always been written in one transaction)
+_WRITABLE_SIZE = const(0x8B)
+_WRITE_REGIONS = ((0x00, 0x20, 4), (0x40, 0x48, 1))
+
+
+def _wrap32(value):
+    """Return a value as a signed 32 bits int"""
+    return ((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+
+def _int32(buffer, index):
+    """Decode a little endian signed 32 bits value without allocating a tuple"""
+    value = (
+        buffer[index]
+        | buffer[index + 1] << 8
+        | buffer[index + 2] << 16
+        | buffer[index + 3] << 24
+    )
+    if value & 0x80000000:
+        value -= 0x100000000
+    return value
+
 
 class _U8_Pixels(PixelBuf):
-    """Neopixels object."""
+    """
+    Neopixels object.
+    Only the LEDs that changed since they were last sent are transmitted,
+    merged into as few contiguous writes as possible in burst mode.
+    """
 
     def __init__(self, unit8, brightness, auto_write):
         self.unit8 = unit8
@@ -59,58 +120,186 @@ class _U8_Pixels(PixelBuf):
 
     def _transmit(self, buffer: bytearray) -> None:
         """Update the pixels"""
-        self.unit8._set_leds(buffer)
+        unit8 = self.unit8
+        start = None
+        end = 0
+        for led in range(9):
+            if unit8._led_changed(buffer, led):
+                if start is not None and led - end > _LED_MERGE_GAP:
+                    unit8._set_leds(buffer, start, end)
+                    start = None
+                if start is None:
+                    start = led
+                end = led + 1
+        if start is not None:
+            unit8._set_leds(buffer, start, end)
+
+
+class EncoderState:
+    """
+    The state of all the inputs of a Unit8Encoder at one point in time,
+    as read by :py:meth:`Unit8Encoder.snapshot`.
+    ``buttons`` is a bitmask with bit n set when button n is pressed.
+    ``valid`` has bit n cleared if channel n could not be read in any of the
+    registers, and bit 8 cleared if the switch could not be read.
+    With ``wide``, ``positions`` is a list that holds the positions of the
+    tracking mode, which are not limited to 32 bits.
+    """
+
+    __slots__ = ("positions", "increments", "buttons", "switch", "timestamp", "valid")
+
+    def __init__(self, wide=False):
+        if wide:
+            self.positions = [0] * 8
+        else:
+            self.positions = array.array("l", [0] * 8)
+        self.increments = array.array("l", [0] * 8)
+        self.buttons = 0
+        self.switch = False
+        self.timestamp = 0.0
+        self.valid = 0x1FF
 
 
-class Unit8Encoder:
+class Unit8Encoder(Unit8Base):
     """
     Driver for the Unit8 8-encoders board.
     """
 
-    def __init__(self, i2c, address=_DEFAULT_ADDRESS, brightness=1.0, auto_write=True):
+    def __init__(
+        self,
+        i2c,
+        address=_DEFAULT_ADDRESS,
+        brightness=1.0,
+        auto_write=True,
+        burst=None,
+        shadow=False,
+        retry=None,
+        tracking=False,
+        resync_interval=None,
+    ):
         self.device = I2CDevice(i2c, address)
         self.register = bytearray(1)
         self.buffer = bytearray(4 * 8)
+        self.retry = retry
+        self.valid = 0xFF
+        self.shadow = shadow
+        self._led_shadow = bytearray(3 * 9)
+        self._led_known = 0
+        self._written_positions = array.array("l", [0] * 8)
+        self._written_known = 0
+        self._batch = WriteBatch(self, _WRITABLE_SIZE, _WRITE_REGIONS)
+        # tracking: position = host base + moved since the last resync
+        self.tracking = False
+        self.resync_interval = resync_interval
+        self._host_base = [0] * 8
+        self._moved = [0] * 8
+        self._device_base = [0] * 8
+        self._pending = [0] * 8
+        self._fresh = False
+        self._resync_at = 0
+        self.burst = False
+        if burst is None:
+            burst = self._probe_burst()
+        self.burst = burst
+        if burst:
+            self._batch.regions = ()
+        if tracking:
+            self.resync()
+            self.tracking = True
         self.pixels = _U8_Pixels(self, brightness, auto_write)
 
+    def _probe_burst(self):
+        """
+        Check if the firmware auto-increments the register address on reads.
+        This writes to the board: encoder 1 is set to a marker value and read
+        back as the second half of a read starting at encoder 0, then restored,
+        all under one lock. Pass ``burst`` to the constructor to skip it.
+        """
+        buffer = self.buffer
+        with self.device as bus:
+            self._read(bus, _ENCODER_REGISTER + 4, buffer, 0, 4)
+            saved = bytes(buffer[0:4])
+            buffer[0] = _ENCODER_REGISTER + 4
+            buffer[1:5] = struct.pack("<l", _PROBE_POSITION)
+            self._write(bus, buffer, 5)
+            try:
+                self._read(bus, _ENCODER_REGISTER, buffer, 0, 8)
+                return _int32(buffer, 4) == _PROBE_POSITION
+            finally:
+                buffer[0] = _ENCODER_REGISTER + 4
+                buffer[1:5] = saved
+                self._write(bus, buffer, 5)
+
     def get_position(self, num):
         """Return the position of one encoder."""
         if num not in range(0, 8):
             raise ValueError("num must be one of 0-7")
-        self.register[0] = _ENCODER_REGISTER + 4 * num
         with self.device as bus:
-            bus.write(self.register)
-            bus.readinto(self.buffer, end=4)
-        return struct.unpack("<l", self.buffer[:4])[0]
+            if self.tracking:
+                self._track(bus)
+                return self._host_base[num] + self._moved[num]
+            self._read(bus, _ENCODER_REGISTER + 4 * num, self.buffer, 0, 4)
+        return _int32(self.buffer, 0)
 
     def set_position(self, num, position):
-        """Set the position of one encoder."""
+        """Set the position of one encoder, only on the host in tracking mode."""
         if num not in range(0, 8):
             raise ValueError("num must be one of 0-7")
+        if self.tracking:
+            self._host_base[num] = position - self._moved[num]
+            return
+        if self._batch.depth:
+            # the position overrides a reset queued before it
+            self._batch.cancel(_ENCODER_RESET_REGISTER + num, 1)
         self.buffer[0] = _ENCODER_REGISTER + 4 * num
         self.buffer[1:5] = struct.pack("<l", position)
-        with self.device as bus:
-            bus.write(self.buffer, end=5)
+        self._batch.send(self.buffer, 5)
+        self._written_positions[num] = position
+        self._written_known |= 1 << num
+
+    def get_written_position(self, num):
+        """
+        Return the position last written to one encoder with set_position,
+        the positions setter, reset or refresh, None if not known.
+        The encoder may have been turned since.
+        """
+        if num not in range(0, 8):
+            raise ValueError("num must be one of 0-7")
+        if not self._written_known & (1 << num):
+            return None
+        return self._written_positions[num]
 
     @property
     def positions(self):
         """A list with the values of the 8 encoders."""
+        if self.tracking:
+            return tuple(self.positions_into([0] * 8))
         with self.device as bus:
-            for num in range(8):
-                self.register[0] = _ENCODER_REGISTER + num * 4
-                bus.write(self.register)
-                bus.readinto(self.buffer, start=num * 4, end=(num + 1) * 4)
+            self._read_channels(bus, _ENCODER_REGISTER, 4)
         return struct.unpack("<8l", self.buffer)
 
     @positions.setter
     def positions(self, positions):
         if len(positions) != 8:
             raise ValueError("expected a list of 8 positions")
-        with self.device as bus:
+        with self._batch:
             for num in range(8):
-                self.buffer[0] = _ENCODER_REGISTER + num * 4
-                self.buffer[1:5] = struct.pack("<l", positions[num])
-                bus.write(self.buffer, end=5)
+                self.set_position(num, positions[num])
+
+    def positions_into(self, buf):
+        """
+        Read the values of the 8 encoders into ``buf`` without allocating,
+        ``buf`` can be an ``array.array("l")`` or any mutable sequence of 8 ints.
+        In tracking mode, the positions can exceed 32 bits, use a list.
+        """
+        with self.device as bus:
+            if self.tracking:
+                self._track(bus)
+                self._host_positions(buf)
+                return buf
+            self._read_channels(bus, _ENCODER_REGISTER, 4)
+        self._decode_int32s(buf)
+        return buf
 
     def get_increment(self, num):
         """
@@ -119,11 +308,14 @@ class Unit8Encoder:
         """
         if num not in range(0, 8):
             raise ValueError("num must be one of 0-7")
-        self.register[0] = _INCREMENT_REGISTER + 4 * num
         with self.device as bus:
-            bus.write(self.register)
-            bus.readinto(self.buffer, end=4)
-        return struct.unpack("<l", self.buffer[:4])[0]
+            if self.tracking:
+                self._track(bus)
+                increment = self._pending[num]
+                self._pending[num] = 0
+                return increment
+            self._read(bus, _INCREMENT_REGISTER + 4 * num, self.buffer, 0, 4)
+        return _int32(self.buffer, 0)
 
     @property
     def increments(self):
@@ -131,40 +323,193 @@ class Unit8Encoder:
         Return a list with the values of the 8 encoders.
         These value is reset to 0 after read.
         """
+        if self.tracking:
+            return tuple(self.increments_into([0] * 8))
         with self.device as bus:
-            for num in range(8):
-                self.register[0] = _INCREMENT_REGISTER + num * 4
-                bus.write(self.register)
-                bus.readinto(self.buffer, start=num * 4, end=(num + 1) * 4)
+            self._read_channels(bus, _INCREMENT_REGISTER, 4)
         return struct.unpack("<8l", self.buffer)
 
+    def increments_into(self, buf):
+        """
+        Read the increments of the 8 encoders into ``buf`` without allocating,
+        ``buf`` can be an ``array.array("l")`` or any mutable sequence of 8 ints.
+        These value is reset to 0 after read.
+        In tracking mode, the increments read with the positions since the
+        last call are returned without reading the board again.
+        """
+        if self.tracking:
+            if not self._fresh:
+                with self.device as bus:
+                    self._track(bus)
+            self._fresh = False
+            self._take_pending(buf)
+            return buf
+        with self.device as bus:
+            self._read_channels(bus, _INCREMENT_REGISTER, 4)
+        self._decode_int32s(buf)
+        return buf
+
+    def _decode_int32s(self, buf):
+        """Decode the 8 32 bits values in the buffer into buf"""
+        buffer = self.buffer
+        for num in range(8):
+            buf[num] = _int32(buffer, 4 * num)
+
+    def _track(self, bus, deadline=None):
+        """Read the increments into the host positions and pending increments"""
+        if self.resync_interval is not None and time.monotonic() >= self._resync_at:
+            self._resync(bus, deadline)
+        self._read_channels(bus, _INCREMENT_REGISTER, 4, deadline)
+        buffer = self.buffer
+        for num in range(8):
+            increment = _int32(buffer, 4 * num)
+            self._moved[num] += increment
+            self._pending[num] += increment
+        self._fresh = True
+
+    def _host_positions(self, buf):
+        """Copy the positions tracked on the host into buf"""
+        for num in range(8):
+            buf[num] = self._host_base[num] + self._moved[num]
+
+    def _take_pending(self, buf):
+        """Copy the increments not returned yet into buf and clear them"""
+        pending = self._pending
+        for num in range(8):
+            buf[num] = pending[num]
+            pending[num] = 0
+
+    def resync(self):
+        """
+        Correct the positions tracked on the host with the positions of the
+        board, for movements missed by failed reads of the increments.
+        Used when starting the tracking mode.
+        """
+        with self.device as bus:
+            self._resync(bus)
+
+    def _resync(self, bus, deadline=None):
+        self._read_channels(bus, _ENCODER_REGISTER, 4, deadline)
+        buffer = self.buffer
+        valid = self.valid
+        for num in range(8):
+            if valid & (1 << num):
+                position = _int32(buffer, 4 * num)
+                self._host_base[num] += _wrap32(position - self._device_base[num])
+                self._device_base[num] = position
+                self._moved[num] = 0
+        # clear the increments already counted in the positions
+        self._read_channels(bus, _INCREMENT_REGISTER, 4, deadline)
+        for num in range(8):
+            self._pending[num] += _int32(buffer, 4 * num)
+        if self.resync_interval is not None:
+            self._resync_at = time.monotonic() + self.resync_interval
+
     def reset(self):
         """Reset the encoder position values"""
-        self.buffer[1] = 1
-        with self.device as bus:
+        if self.tracking:
+            for num in range(8):
+                self._host_base[num] = -self._moved[num]
+            return
+        with self._batch:
             for i in range(8):
-                self.buffer[0] = 0x40 + i
-                bus.write(self.buffer, end=2)
+                # the reset overrides a position queued before it
+                self._batch.cancel(_ENCODER_REGISTER + 4 * i, 4)
+                self.buffer[0] = _ENCODER_RESET_REGISTER + i
+                self.buffer[1] = 1
+                self._batch.send(self.buffer, 2)
+                self._written_positions[i] = 0
+        self._written_known = 0xFF
 
     @property
     def buttons(self):
         """A tuple with all the button values"""
         with self.device as bus:
-            for bnum in range(8):
-                self.register[0] = 0x50 + bnum
-                bus.write(self.register)
-                bus.readinto(self.buffer, start=bnum, end=bnum + 1)
+            self._read_channels(bus, _BUTTONS_REGISTER, 1, fill=_RELEASED)
         return tuple(not b for b in struct.unpack("<8B", self.buffer[:8]))
 
+    def get_button(self, num):
+        """Return True if one button is pressed."""
+        if num not in range(0, 8):
+            raise ValueError("num must be one of 0-7")
+        with self.device as bus:
+            self._read(bus, _BUTTONS_REGISTER + num, self.buffer, 0, 1)
+        return not self.buffer[0]
+
+    @property
+    def buttons_mask(self):
+        """The buttons as a bitmask, bit n is set when button n is pressed"""
+        with self.device as bus:
+            self._read_channels(bus, _BUTTONS_REGISTER, 1, fill=_RELEASED)
+        return self._decode_buttons_mask()
+
+    def _decode_buttons_mask(self):
+        """Pack the 8 button values in the buffer into a bitmask"""
+        buffer = self.buffer
+        mask = 0
+        for num in range(8):
+            if not buffer[num]:
+                mask |= 1 << num
+        return mask
+
+    def buttons_into(self, buf):
+        """
+        Read the buttons into ``buf`` without allocating, 1 if pressed, 0 if not,
+        ``buf`` can be a ``bytearray`` or any mutable sequence of 8 ints.
+        """
+        with self.device as bus:
+            self._read_channels(bus, _BUTTONS_REGISTER, 1, fill=_RELEASED)
+        buffer = self.buffer
+        for num in range(8):
+            buf[num] = 0 if buffer[num] else 1
+        return buf
+
     @property
     def switch(self):
         """The value of the switch"""
-        self.register[0] = _SWITCH_REGISTER
         with self.device as bus:
-            bus.write(self.register)
-            bus.readinto(self.buffer, end=1)
+            self._read(bus, _SWITCH_REGISTER, self.buffer, 0, 1)
         return bool(self.buffer[0])
 
+    def snapshot(self, state=None):
+        """
+        Read the positions, increments, buttons and switch under one bus lock.
+        Update and return ``state``, or a new :py:class:`EncoderState`.
+        The increments are reset to 0 after read.
+        """
+        if state is None:
+            state = EncoderState(self.tracking)
+        elif self.tracking and not isinstance(state.positions, list):
+            state.positions = [0] * 8
+        buffer = self.buffer
+        deadline = self._deadline()
+        with self.device as bus:
+            if self.tracking:
+                self._track(bus, deadline)
+                self._fresh = False
+                self._host_positions(state.positions)
+                self._take_pending(state.increments)
+                valid = self.valid
+            else:
+                self._read_channels(bus, _ENCODER_REGISTER, 4, deadline)
+                self._decode_int32s(state.positions)
+                valid = self.valid
+                self._read_channels(bus, _INCREMENT_REGISTER, 4, deadline)
+                self._decode_int32s(state.increments)
+                valid &= self.valid
+            self._read_channels(bus, _BUTTONS_REGISTER, 1, deadline, _RELEASED)
+            buttons = self._decode_buttons_mask()
+            valid &= self.valid
+            if self._read(bus, _SWITCH_REGISTER, buffer, 0, 1, deadline, True):
+                valid |= 1 << 8
+            else:
+                buffer[0] = 0
+        state.buttons = buttons
+        state.switch = bool(buffer[0])
+        state.valid = valid
+        state.timestamp = time.monotonic()
+        return state
+
     def set_led(self, position, color):
         """Set the color to one RGB LED"""
         if position not in range(0, 9):
@@ -177,21 +522,68 @@ class Unit8Encoder:
             raise ValueError("color must be an int or (r,g,b) tuple")
         self.buffer[0] = _PIXELS_REGISTER + 3 * position
         self.buffer[1:4] = color
-        with self.device as bus:
-            bus.write(self.buffer, end=4)
+        self._batch.send(self.buffer, 4)
+        self._led_shadow[3 * position : 3 * position + 3] = color
+        self._led_known |= 1 << position
 
     def get_led(self, position):
-        """Get the current color of an RGB LED"""
+        """
+        Get the current color of an RGB LED.
+        With ``shadow`` enabled, a color that was written or read before
+        is returned without reading the board.
+        """
         if position not in range(0, 9):
             raise ValueError("pixel position must be one of 0-8")
-        self.register[0] = _PIXELS_REGISTER + 3 * position
+        index = 3 * position
+        if not (self.shadow and self._led_known & (1 << position)):
+            with self.device as bus:
+                self._read(
+                    bus, _PIXELS_REGISTER + index, self._led_shadow, index, index + 3
+                )
+            self._led_known |= 1 << position
+        return tuple(self._led_shadow[index : index + 3])
+
+    def refresh(self):
+        """Read the LED colors and encoder positions into the shadow registers"""
         with self.device as bus:
-            bus.write(self.register)
-            bus.read(self.buffer, end=3)
-        return tuple(self.buffer[:3])
+            for led in range(9):
+                index = 3 * led
+                self._read(
+                    bus, _PIXELS_REGISTER + index, self._led_shadow, index, index + 3
+                )
+            self._led_known = 0x1FF
+            self._read_channels(bus, _ENCODER_REGISTER, 4)
+        self._decode_int32s(self._written_positions)
+        self._written_known = 0xFF
+
+    def _led_changed(self, buffer, led):
+        """Whether an LED in the buffer differs from what was last sent"""
+        if not self._led_known & (1 << led):
+            return True
+        index = 3 * led
+        shadow = self._led_shadow
+        return (
+            buffer[index] != shadow[index]
+            or buffer[index + 1] != shadow[index + 1]
+            or buffer[index + 2] != shadow[index + 2]
+        )
 
-    def _set_leds(self, buffer):
-        """Set all LEDs with a binary buffer"""
-        self.register[0] = _PIXELS_REGISTER
-        with self.device as bus:
-            bus.write(self.register + buffer)
+    def _set_leds(self, buffer, start=0, end=9):
+        """
+        Set the LEDs from start to end (excluded) with a binary buffer.
+        If that fails with a retry policy, the LEDs are sent again on the next show.
+        """
+        data = buffer[3 * start : 3 * end]
+        self.register[0] = _PIXELS_REGISTER + 3 * start
+        mask = (1 << end) - (1 << start)
+        message = self.register + data
+        if not self._batch.send(message, len(message), partial=True):
+            self._led_known &= ~mask
+            return
+        self._led_shadow[3 * start : 3 * end] = data
+        self._led_known |= mask
+
+    def _forget_writes(self):
+        """Queued writes were lost, the shadows can't be trusted anymore"""
+        super()._forget_writes()
+        self._written_known = 0
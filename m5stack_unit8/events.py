@@ -0,0 +1,164 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes
+"""
+`m5stack_unit8.events`
+================================================================================
+
+Input events reported by the Unit8 pollers, and a debouncing event engine
+for the buttons and switch.
+
+
+* Author(s): Neradoc
+"""
+
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+ENCODER_DELTA = 1
+BUTTON_PRESS = 2
+BUTTON_RELEASE = 3
+KNOB_MOVED = 4
+SWITCH_TOGGLE = 5
+LONG_PRESS = 6
+DOUBLE_PRESS = 7
+
+SWITCH_BIT = 8
+"""Bit of the switch in the masks used by :py:class:`ButtonEvents`."""
+
+_NAMES = {
+    ENCODER_DELTA: "ENCODER_DELTA",
+    BUTTON_PRESS: "BUTTON_PRESS",
+    BUTTON_RELEASE: "BUTTON_RELEASE",
+    KNOB_MOVED: "KNOB_MOVED",
+    SWITCH_TOGGLE: "SWITCH_TOGGLE",
+    LONG_PRESS: "LONG_PRESS",
+    DOUBLE_PRESS: "DOUBLE_PRESS",
+}
+
+
+class Event:
+    """
+    A change of one input.
+
+    - ``kind``: one of the event constants of this module.
+    - ``channel``: the encoder, button or knob number, 0-7, or -1 for the switch.
+    - ``value``: the encoder delta, the new knob angle (16 bits),
+      or the new button or switch state (True when pressed or on).
+    - ``timestamp``: ``time.monotonic()`` when the change was read.
+    """
+
+    __slots__ = ("kind", "channel", "value", "timestamp")
+
+    def __init__(self, kind, channel, value, timestamp):
+        self.kind = kind
+        self.channel = channel
+        self.value = value
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        name = _NAMES.get(self.kind, self.kind)
+        return f"<Event {name} channel={self.channel} value={self.value}>"
+
+
+class ButtonEvents:
+    """
+    Debounce the buttons and switch of a Unit8 board and detect
+    press, release, long press, double press and switch toggle events.
+
+    The inputs are packed in a bitmask, bits 0-7 for the buttons of the
+    encoder board and bit ``SWITCH_BIT`` for the switch. Changes are found
+    by XOR with the previous mask, so a poll where nothing changed costs
+    almost nothing. A change must stay stable for ``debounce`` seconds
+    to be reported. A button held ``long_press`` seconds reports a long press,
+    and a press less than ``double_press`` seconds after the previous one
+    reports a double press (after the press event).
+    ``state`` is the current debounced bitmask.
+
+    :param unit: a Unit8Encoder or Unit8Angle, or None to use :py:meth:`update`.
+    """
+
+    def __init__(self, unit=None, debounce=0.02, long_press=0.5, double_press=0.3):
+        self.unit = unit
+        self.debounce = debounce
+        self.long_press = long_press
+        self.double_press = double_press
+        self.state = 0
+        self._raw = None
+        self._held = 0
+        self._changed_at = [0.0] * 9
+        self._pressed_at = [0.0] * 9
+        self._last_press = [-double_press] * 9
+        self._events = []
+
+    def poll(self):
+        """
+        Read the board and return the list of new events.
+        The list is reused by the next call.
+        """
+        unit = self.unit
+        mask = unit.switch << SWITCH_BIT
+        if hasattr(unit, "buttons_mask"):
+            mask |= unit.buttons_mask
+        return self.update(mask)
+
+    def update(self, mask, now=None):
+        """
+        Update with a raw bitmask, return the list of new events.
+        The list is reused by the next call.
+        """
+        if now is None:
+            now = time.monotonic()
+        events = self._events
+        events.clear()
+        if self._raw is None:
+            self._raw = self.state = mask
+            return events
+        changed = mask ^ self._raw
+        if changed:
+            self._raw = mask
+            for bit in range(9):
+                if changed & (1 << bit):
+                    self._changed_at[bit] = now
+        pending = self._raw ^ self.state
+        if pending:
+            for bit in range(9):
+                if (
+                    pending & (1 << bit)
+                    and now - self._changed_at[bit] >= self.debounce
+                ):
+                    self._settle(bit, now)
+        if self._held:
+            for bit in range(8):
+                if (
+                    self._held & (1 << bit)
+                    and now - self._pressed_at[bit] >= self.long_press
+                ):
+                    self._held &= ~(1 << bit)
+                    events.append(Event(LONG_PRESS, bit, True, now))
+        return events
+
+    def _settle(self, bit, now):
+        """Accept the new value of a bit and report it"""
+        events = self._events
+        self.state ^= 1 << bit
+        value = bool(self.state & (1 << bit))
+        if bit == SWITCH_BIT:
+            events.append(Event(SWITCH_TOGGLE, -1, value, now))
+        elif value:
+            events.append(Event(BUTTON_PRESS, bit, True, now))
+            if now - self._last_press[bit] < self.double_press:
+                events.append(Event(DOUBLE_PRESS, bit, True, now))
+                # a third press starts a new double press
+                self._last_press[bit] = -self.double_press
+            else:
+                self._last_press[bit] = now
+            self._pressed_at[bit] = now
+            self._held |= 1 << bit
+        else:
+            self._held &= ~(1 << bit)
+            events.append(Event(BUTTON_RELEASE, bit, False, now))
@@ -0,0 +1,308 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes, import-outside-toplevel
+"""
+`m5stack_unit8.export`
+================================================================================
+
+Export the changes of Unit8 boards as a stream of delta records, sent in
+batches to sinks: UDP (OSC or binary), newline-delimited JSON or binary files,
+or a callback.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+Each snapshot of a board is compared to the values last exported, and only the
+changes become records: ``(timestamp, source, field, channel, value)``, where
+``source`` is a number identifying the board. The records are coalesced during
+a time ``window``: only the last value of a channel is kept, and increments are
+added up. At the end of the window, the batch is sent to each sink.
+
+A sink that can't take a batch (a full socket buffer for example) returns False,
+the batch is kept for that sink and merged with the next one, so a slow sink
+gets fewer, coalesced records instead of a growing queue.
+
+.. code-block:: python
+
+    exporter = DeltaExporter([UDPSink(port=9000), NDJSONSink(open("log.json", "a"))])
+    state = None
+    while True:
+        state = encoder.snapshot(state)
+        exporter.update(state, source=0)
+"""
+
+import json
+import struct
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+FIELD_POSITION = 1
+FIELD_INCREMENT = 2
+FIELD_BUTTON = 3
+FIELD_SWITCH = 4
+FIELD_ANGLE = 5
+FIELD_NAMES = {
+    FIELD_POSITION: "position",
+    FIELD_INCREMENT: "increment",
+    FIELD_BUTTON: "button",
+    FIELD_SWITCH: "switch",
+    FIELD_ANGLE: "angle",
+}
+
+# timestamp, source, field, channel, value
+BINARY_RECORD = struct.Struct("<dBBBq")
+
+_OSC_BUNDLE = b"#bundle\x00" + struct.pack(">Q", 1)
+_OSC_MAX_DATAGRAM = 1400
+
+
+class DeltaExporter:
+    """
+    Turn successive snapshots of boards into batches of delta records.
+
+    :param sinks: the sinks the batches are sent to.
+    :param float window: the duration of a batch in seconds.
+    :param int threshold: the minimal change of an angle that is exported.
+    """
+
+    def __init__(self, sinks=(), window=0.02, threshold=0):
+        self.sinks = list(sinks)
+        self.window = window
+        self.threshold = threshold
+        self.records = 0
+        self.batches = 0
+        self.deferred = 0
+        self._last = {}
+        self._pending = {}
+        self._backlog = {}
+        self._window_end = None
+
+    def _change(self, source, field, channel, value, timestamp, threshold=0):
+        key = (source, field, channel)
+        last = self._last.get(key)
+        if last is not None and abs(value - last) <= threshold:
+            return
+        self._last[key] = value
+        self._pending[key] = (timestamp, value)
+
+    def update(self, state, source=0, now=None):
+        """
+        Add the changes of a snapshot (``EncoderState`` or ``AngleState``)
+        of the board ``source``, and send the batch if the window ended.
+        """
+        timestamp = state.timestamp
+        change = self._change
+        # the channels that could not be read are skipped
+        valid = state.valid
+        if hasattr(state, "positions"):
+            pending = self._pending
+            for channel in range(8):
+                if not valid & (1 << channel):
+                    continue
+                change(
+                    source, FIELD_POSITION, channel, state.positions[channel], timestamp
+                )
+                increment = state.increments[channel]
+                if increment:
+                    key = (source, FIELD_INCREMENT, channel)
+                    if key in pending:
+                        increment += pending[key][1]
+                    pending[key] = (timestamp, increment)
+                change(
+                    source,
+                    FIELD_BUTTON,
+                    channel,
+                    state.buttons >> channel & 1,
+                    timestamp,
+                )
+        else:
+            for channel in range(8):
+                if not valid & (1 << channel):
+                    continue
+                change(
+                    source,
+                    FIELD_ANGLE,
+                    channel,
+                    state.angles[channel],
+                    timestamp,
+                    self.threshold,
+                )
+        if valid & 0x100:
+            change(source, FIELD_SWITCH, 0, int(state.switch), timestamp)
+        if now is None:
+            now = time.monotonic()
+        if self._window_end is None:
+            self._window_end = now + self.window
+        elif now >= self._window_end:
+            self.flush()
+            self._window_end = now + self.window
+
+    @staticmethod
+    def _merge(into, pending):
+        """Coalesce pending records into a dict of records"""
+        for key, (timestamp, value) in pending.items():
+            if key[1] == FIELD_INCREMENT and key in into:
+                value += into[key][1]
+            into[key] = (timestamp, value)
+
+    def flush(self):
+        """Send the pending records to the sinks, return the number of records"""
+        pending = self._pending
+        self._pending = {}
+        for index, sink in enumerate(self.sinks):
+            backlog = self._backlog.pop(index, None)
+            if backlog:
+                self._merge(backlog, pending)
+                records = backlog
+            else:
+                records = pending
+            if not records:
+                continue
+            batch = sorted(
+                (timestamp, key[0], key[1], key[2], value)
+                for key, (timestamp, value) in records.items()
+            )
+            if sink.send(batch) is False:
+                self._backlog[index] = dict(records)
+                self.deferred += 1
+        if pending:
+            self.records += len(pending)
+            self.batches += 1
+        return len(pending)
+
+
+class CallbackSink:
+    """Call a function with each batch, a list of record tuples"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def send(self, batch):
+        """Send a batch, return False if it must be sent again later"""
+        return self.function(batch)
+
+
+class NDJSONSink:
+    """
+    Write one JSON object per record and per line to a text file:
+    ``{"t": timestamp, "src": source, "field": name, "ch": channel, "v": value}``
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def send(self, batch):
+        """Send a batch, return False if it must be sent again later"""
+        lines = []
+        for timestamp, source, field, channel, value in batch:
+            record = {
+                "t": timestamp,
+                "src": source,
+                "field": FIELD_NAMES[field],
+                "ch": channel,
+                "v": value,
+            }
+            lines.append(json.dumps(record))
+        try:
+            self.file.write("\n".join(lines) + "\n")
+            self.file.flush()
+        except BlockingIOError:
+            return False
+        return True
+
+
+class BinarySink:
+    """Write the records to a binary file as ``BINARY_RECORD`` structures"""
+
+    def __init__(self, file):
+        self.file = file
+
+    def send(self, batch):
+        """Send a batch, return False if it must be sent again later"""
+        data = b"".join(BINARY_RECORD.pack(*record) for record in batch)
+        try:
+            self.file.write(data)
+            self.file.flush()
+        except BlockingIOError:
+            return False
+        return True
+
+
+def _osc_string(text):
+    data = text.encode() + b"\x00"
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def _osc_message(source, field, channel, value):
+    """An OSC message ``/unit8/<source>/<field>/<channel>`` with an int argument"""
+    address = _osc_string(f"/unit8/{source}/{FIELD_NAMES[field]}/{channel}")
+    if -0x80000000 <= value <= 0x7FFFFFFF:
+        return address + _osc_string(",i") + struct.pack(">i", value)
+    return address + _osc_string(",h") + struct.pack(">q", value)
+
+
+class UDPSink:
+    """
+    Send the batches as UDP datagrams on a non-blocking socket, as OSC bundles
+    (one message per record) or as ``BINARY_RECORD`` structures.
+    Batches are split into datagrams of at most 1400 bytes. If the socket
+    can't take the first datagram, the batch is sent again later, if it can't
+    take one of the others, the rest of the batch is dropped and counted in
+    ``dropped``, to avoid sending records twice.
+    """
+
+    def __init__(self, host="127.0.0.1", port=9000, osc=True):
+        import socket
+
+        self.address = (host, port)
+        self.osc = osc
+        self.dropped = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def close(self):
+        """Close the socket"""
+        self.socket.close()
+
+    def _datagrams(self, batch):
+        """Pack the records into datagrams"""
+        datagrams = []
+        if self.osc:
+            data = bytearray(_OSC_BUNDLE)
+            for _, source, field, channel, value in batch:
+                message = _osc_message(source, field, channel, value)
+                element = struct.pack(">i", len(message)) + message
+                if len(data) + len(element) > _OSC_MAX_DATAGRAM:
+                    datagrams.append(data)
+                    data = bytearray(_OSC_BUNDLE)
+                data += element
+            if len(data) > len(_OSC_BUNDLE):
+                datagrams.append(data)
+        else:
+            per_datagram = _OSC_MAX_DATAGRAM // BINARY_RECORD.size
+            for start in range(0, len(batch), per_datagram):
+                records = batch[start : start + per_datagram]
+                datagrams.append(
+                    b"".join(BINARY_RECORD.pack(*record) for record in records)
+                )
+        return datagrams
+
+    def send(self, batch):
+        """Send a batch, return False if it must be sent again later"""
+        datagrams = self._datagrams(batch)
+        for index, datagram in enumerate(datagrams):
+            try:
+                self.socket.sendto(datagram, self.address)
+            except BlockingIOError:
+                if index == 0:
+                    return False
+                self.dropped += len(datagrams) - index
+                break
+        return True
@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes
+"""
+`m5stack_unit8.filter`
+================================================================================
+
+Jitter filter for the values of the potentiometers of the Unit8 Angle.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The samples of all the channels are smoothed at once, with an exponential
+moving average (in fixed point) or a median of the last samples, into arrays
+allocated when the filter is created. A channel's value only changes when the
+smoothed value moved by at least ``hysteresis`` from it, and ``update()``
+returns the bitmask of the channels that changed, so noise doesn't look like
+input. When the smoothed value reaches an end of the range of the samples, the
+value changes to it whatever the hysteresis, so that a knob turned to a stop
+always reads 0 or the maximum.
+
+.. code-block:: python
+
+    jitter = JitterFilter(hysteresis=64)
+    samples = array.array("H", [0] * 8)
+    while True:
+        changed = jitter.update(angle.angles_into(samples))
+        for num in range(8):
+            if changed & (1 << num):
+                print(num, jitter.values[num])
+"""
+
+import array
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+FILTER_EMA = "ema"
+FILTER_MEDIAN = "median"
+FILTERS = (FILTER_EMA, FILTER_MEDIAN)
+
+# fractional bits of the moving average
+_FRACTION = 8
+
+
+class JitterFilter:
+    """
+    Smooth the values of several channels and report their meaningful changes.
+
+    :param int channels: the number of channels.
+    :param str mode: ``FILTER_EMA`` or ``FILTER_MEDIAN``.
+    :param int smoothing: with EMA, each sample weighs ``1 / 2 ** smoothing``.
+    :param int window: with median, the number of samples (odd).
+    :param int hysteresis: the movement needed to change a value, in the unit
+      of the samples (the 16 bits of ``angles``, or the raw 12 bits values).
+    :param int maximum: the largest sample, 0xFFFF for ``angles``, 0xFFF for
+      the raw 12 bits values.
+    """
+
+    def __init__(
+        self,
+        channels=8,
+        mode=FILTER_EMA,
+        smoothing=2,
+        window=3,
+        hysteresis=64,
+        maximum=0xFFFF,
+    ):
+        if mode not in FILTERS:
+            raise ValueError(f"mode must be one of {FILTERS}")
+        if window < 1 or window % 2 == 0:
+            raise ValueError("window must be an odd number")
+        self.channels = channels
+        self.mode = mode
+        self.smoothing = smoothing
+        self.window = window
+        self.hysteresis = hysteresis
+        self.maximum = maximum
+        self.values = array.array("l", [0] * channels)
+        self._average = array.array("l", [0] * channels)
+        self._history = array.array("l", [0] * (channels * window))
+        self._sorted = array.array("l", [0] * window)
+        self._index = 0
+        self._primed = False
+
+    def reset(self):
+        """Forget the previous samples, the next update sets all the values"""
+        self._primed = False
+
+    def _prime(self, samples):
+        for num in range(self.channels):
+            sample = samples[num]
+            self.values[num] = sample
+            self._average[num] = sample << _FRACTION
+            for index in range(self.window):
+                self._history[num * self.window + index] = sample
+        self._primed = True
+        return (1 << self.channels) - 1
+
+    def _median(self, num):
+        """The median of the samples of a channel, by insertion sort"""
+        window = self.window
+        history = self._history
+        ordered = self._sorted
+        for index in range(window):
+            sample = history[num * window + index]
+            position = index
+            while position and ordered[position - 1] > sample:
+                ordered[position] = ordered[position - 1]
+                position -= 1
+            ordered[position] = sample
+        return ordered[window // 2]
+
+    def update(self, samples):
+        """
+        Add one sample per channel, return the bitmask of the channels
+        whose value changed. All of them change on the first update.
+        """
+        if not self._primed:
+            return self._prime(samples)
+        changed = 0
+        values = self.values
+        median = self.mode == FILTER_MEDIAN
+        if median:
+            for num in range(self.channels):
+                self._history[num * self.window + self._index] = samples[num]
+            self._index = (self._index + 1) % self.window
+        average = self._average
+        maximum = self.maximum
+        for num in range(self.channels):
+            if median:
+                smooth = self._median(num)
+            else:
+                average[num] += (
+                    (samples[num] << _FRACTION) - average[num]
+                ) >> self.smoothing
+                smooth = (average[num] + (1 << (_FRACTION - 1))) >> _FRACTION
+            if smooth in (0, maximum) and smooth != values[num]:
+                # snap to the ends of the range
+                values[num] = smooth
+                changed |= 1 << num
+            elif abs(smooth - values[num]) >= self.hysteresis:
+                values[num] = smooth
+                changed |= 1 << num
+        return changed
@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=invalid-name, attribute-defined-outside-init
+"""
+`m5stack_unit8.i2cdev`
+================================================================================
+
+Direct access to a Linux ``/dev/i2c-N`` bus, with a busio-like API, for Linux
+hosts where Blinka's ``busio`` does one system call per transaction.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+Each transaction is one ``I2C_RDWR`` ioctl. :py:meth:`I2CDev.sweep` packs the
+reads of all the channels of a register block into a single ioctl, each
+register write being followed by a STOP (``I2C_M_STOP``) then the read, as the
+boards require. The drivers use it for the reads channel by channel when the
+bus provides it. The STOPs need ``I2C_FUNC_PROTOCOL_MANGLING`` from the kernel
+driver of the I2C adapter: it is queried with ``I2C_FUNCS`` when opening the
+bus, and ``sweep`` is None if the adapter doesn't support it.
+
+The ioctl function can be replaced for testing, it receives the file
+descriptor, the request and the address of an ``I2CRdwrData`` structure, or of
+an unsigned long to receive the functionalities for ``I2C_FUNCS``.
+
+.. code-block:: python
+
+    from m5stack_unit8.i2cdev import I2CDev
+    from m5stack_unit8.angle import Unit8Angle
+
+    angle = Unit8Angle(I2CDev(1), delay=None)
+
+**Software and Dependencies:**
+
+* Linux with the i2c-dev kernel module.
+"""
+
+import ctypes
+import fcntl
+import os
+import threading
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+I2C_FUNCS = 0x0705
+I2C_RDWR = 0x0707
+I2C_FUNC_PROTOCOL_MANGLING = 0x0004
+I2C_M_RD = 0x0001
+I2C_M_STOP = 0x8000
+
+# the kernel accepts up to 42 messages in one I2C_RDWR
+_MAX_MESSAGES = 42
+
+
+class I2CMessage(ctypes.Structure):
+    """``struct i2c_msg``"""
+
+    _fields_ = [
+        ("addr", ctypes.c_uint16),
+        ("flags", ctypes.c_uint16),
+        ("len", ctypes.c_uint16),
+        ("buf", ctypes.c_void_p),
+    ]
+
+
+class I2CRdwrData(ctypes.Structure):
+    """``struct i2c_rdwr_ioctl_data``"""
+
+    _fields_ = [
+        ("msgs", ctypes.POINTER(I2CMessage)),
+        ("nmsgs", ctypes.c_uint32),
+    ]
+
+
+def _address_of(buffer, start):
+    """The memory address of a bytearray at index start"""
+    return ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer)) + start
+
+
+class I2CDev:
+    """
+    An I2C bus on ``/dev/i2c-N``, usable in place of ``busio.I2C``.
+
+    :param int bus: the number N of the bus.
+    :param ioctl: the function doing the ioctl calls, ``fcntl.ioctl`` by default.
+    :param int fd: an open file descriptor to use instead of opening the bus.
+
+    ``functionality`` is the ``I2C_FUNC_*`` flags of the adapter.
+    """
+
+    def __init__(self, bus=1, ioctl=None, fd=None):
+        self._ioctl = fcntl.ioctl if ioctl is None else ioctl
+        self._fd = os.open(f"/dev/i2c-{bus}", os.O_RDWR) if fd is None else fd
+        self._lock = threading.Lock()
+        self._messages = (I2CMessage * _MAX_MESSAGES)()
+        self._data = I2CRdwrData(self._messages, 0)
+        self._write_buffer = bytearray(64)
+        self._registers = bytearray(_MAX_MESSAGES // 2)
+        self.functionality = self._functionality()
+        if not self.functionality & I2C_FUNC_PROTOCOL_MANGLING:
+            # the STOPs of sweep would be ignored
+            self.sweep = None
+
+    def _functionality(self):
+        """The ``I2C_FUNC_*`` flags of the adapter, 0 if they can't be read"""
+        funcs = ctypes.c_ulong(0)
+        try:
+            self._ioctl(self._fd, I2C_FUNCS, ctypes.addressof(funcs))
+        except OSError:
+            return 0
+        return funcs.value
+
+    def deinit(self):
+        """Close the bus"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.deinit()
+
+    def try_lock(self):
+        """Lock the bus, return False if it is already locked"""
+        return self._lock.acquire(False)
+
+    def unlock(self):
+        """Release the lock on the bus"""
+        self._lock.release()
+
+    def _message(self, index, address, flags, buffer, start, end):
+        message = self._messages[index]
+        message.addr = address
+        message.flags = flags
+        message.len = end - start
+        message.buf = _address_of(buffer, start)
+
+    def _transfer(self, count):
+        """Send the first count messages in one ioctl, raise OSError on failure"""
+        self._data.nmsgs = count
+        self._ioctl(self._fd, I2C_RDWR, ctypes.addressof(self._data))
+
+    def _writable(self, buffer, start, end):
+        """Return a bytearray of the data to write and the start and end in it"""
+        if isinstance(buffer, bytearray):
+            return buffer, start, end
+        if end - start > len(self._write_buffer):
+            self._write_buffer = bytearray(end - start)
+        self._write_buffer[: end - start] = buffer[start:end]
+        return self._write_buffer, 0, end - start
+
+    def scan(self):
+        """Return the list of the addresses that answer on the bus"""
+        found = []
+        for address in range(0x08, 0x78):
+            self._message(0, address, 0, self._write_buffer, 0, 0)
+            try:
+                self._transfer(1)
+            except OSError:
+                continue
+            found.append(address)
+        return found
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        """Write the buffer from start to end to the device"""
+        end = len(buffer) if end is None else end
+        buffer, start, end = self._writable(buffer, start, end)
+        self._message(0, address, 0, buffer, start, end)
+        self._transfer(1)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        """Read from the device into the buffer from start to end"""
+        end = len(buffer) if end is None else end
+        self._message(0, address, I2C_M_RD, buffer, start, end)
+        self._transfer(1)
+
+    def writeto_then_readfrom(
+        self,
+        address,
+        buffer_out,
+        buffer_in,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None,
+    ):
+        """Write then read with a repeated start, in one ioctl"""
+        out_end = len(buffer_out) if out_end is None else out_end
+        in_end = len(buffer_in) if in_end is None else in_end
+        buffer_out, out_start, out_end = self._writable(buffer_out, out_start, out_end)
+        self._message(0, address, 0, buffer_out, out_start, out_end)
+        self._message(1, address, I2C_M_RD, buffer_in, in_start, in_end)
+        self._transfer(2)
+
+    def sweep(  # pylint: disable=method-hidden
+        self, address, register, width, count, buffer
+    ):
+        """
+        For each of ``count`` channels, write the register address of the
+        channel followed by a STOP, then read ``width`` bytes into the buffer,
+        all in one ioctl. Channel n is at ``register + n * width`` and read
+        into ``buffer[n * width:(n + 1) * width]``.
+        """
+        if 2 * count > _MAX_MESSAGES:
+            raise ValueError(f"at most {_MAX_MESSAGES // 2} channels")
+        registers = self._registers
+        for num in range(count):
+            registers[num] = register + num * width
+            self._message(2 * num, address, I2C_M_STOP, registers, num, num + 1)
+            self._message(
+                2 * num + 1, address, I2C_M_RD, buffer, num * width, (num + 1) * width
+            )
+        self._transfer(2 * count)
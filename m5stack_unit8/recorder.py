@@ -0,0 +1,239 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments, no-self-use
+"""
+`m5stack_unit8.recorder`
+================================================================================
+
+Record the I2C traffic of the drivers to a trace file, and replay it without
+the hardware.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+A trace file starts with ``b"U8TR"`` and a version byte, followed by one record
+per transaction: a header packed as ``<IBBH`` with the microseconds since the
+previous record, the flags (``FLAG_READ``, ``FLAG_ERROR``), the address and the
+data length, then the data written or read. A failed transaction has no data.
+
+.. code-block:: python
+
+    with open("session.u8tr", "wb") as file:
+        encoder = Unit8Encoder(RecordingI2C(board.STEMMA_I2C(), file))
+        ...
+
+    with open("session.u8tr", "rb") as file:
+        encoder = Unit8Encoder(ReplayI2C(file, speed=10))
+        ...
+"""
+
+import struct
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+MAGIC = b"U8TR\x01"
+FLAG_READ = 0x01
+FLAG_ERROR = 0x80
+_HEADER = "<IBBH"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+
+def _now_us():
+    if hasattr(time, "monotonic_ns"):
+        return time.monotonic_ns() // 1000
+    return int(time.monotonic() * 1_000_000)
+
+
+def read_trace(file):
+    """
+    Iterate over the records of a trace file as tuples of
+    ``(time_us, flags, address, data)``, time_us counted from the first record.
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a Unit8 trace file")
+    time_us = 0
+    while True:
+        header = file.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE:
+            return
+        delta, flags, address, length = struct.unpack(_HEADER, header)
+        time_us += delta
+        yield (time_us, flags, address, file.read(length))
+
+
+class RecordingI2C:
+    """
+    Wrap an I2C bus and write every transaction to a binary trace file.
+
+    :param i2c: the bus used by the drivers.
+    :param file: a file open in binary write mode.
+    """
+
+    def __init__(self, i2c, file):
+        self.i2c = i2c
+        self.file = file
+        self._last = None
+        file.write(MAGIC)
+
+    def _record(self, flags, address, data):
+        now = _now_us()
+        delta = 0 if self._last is None else now - self._last
+        self._last = now
+        self.file.write(
+            struct.pack(_HEADER, min(delta, 0xFFFFFFFF), flags, address, len(data))
+        )
+        self.file.write(data)
+
+    def try_lock(self):
+        """Lock the bus"""
+        return self.i2c.try_lock()
+
+    def unlock(self):
+        """Unlock the bus"""
+        self.i2c.unlock()
+
+    def scan(self):
+        """Scan the bus, not recorded"""
+        return self.i2c.scan()
+
+    def deinit(self):
+        """Release the bus"""
+        self.i2c.deinit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.deinit()
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        """Write and record the transaction"""
+        if end is None:
+            end = len(buffer)
+        try:
+            self.i2c.writeto(address, buffer, start=start, end=end)
+        except OSError:
+            self._record(FLAG_ERROR, address, b"")
+            raise
+        self._record(0, address, bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        """Read and record the transaction"""
+        if end is None:
+            end = len(buffer)
+        try:
+            self.i2c.readfrom_into(address, buffer, start=start, end=end)
+        except OSError:
+            self._record(FLAG_READ | FLAG_ERROR, address, b"")
+            raise
+        self._record(FLAG_READ, address, bytes(buffer[start:end]))
+
+    def writeto_then_readfrom(
+        self,
+        address,
+        buffer_out,
+        buffer_in,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None,
+    ):
+        """Write then read, recorded as two transactions"""
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
+
+
+class ReplayI2C:
+    """
+    A fake I2C bus answering the drivers with the transactions of a trace file.
+
+    The drivers must do the same transactions as during the recording,
+    a different transaction raises a ValueError.
+
+    :param file: a trace file open in binary read mode.
+    :param float speed: replay speed, 1 for the original timing, 0 to replay
+      as fast as possible.
+    :param bool strict: check that the written data matches the trace.
+    """
+
+    def __init__(self, file, speed=1.0, strict=True):
+        self.speed = speed
+        self.strict = strict
+        self._records = read_trace(file)
+        self._start = None
+
+    def _next(self, flags, address, length):
+        record = next(self._records, None)
+        if record is None:
+            raise ValueError("end of the trace")
+        time_us, record_flags, record_address, data = record
+        if record_flags & FLAG_READ != flags or record_address != address:
+            raise ValueError(f"trace diverged at {time_us}us")
+        if not record_flags & FLAG_ERROR and length != len(data):
+            raise ValueError(
+                f"trace diverged at {time_us}us: length {length} != {len(data)}"
+            )
+        if self.speed:
+            now = _now_us()
+            if self._start is None:
+                self._start = now - time_us / self.speed
+            wait = self._start + time_us / self.speed - now
+            if wait > 0:
+                time.sleep(wait / 1_000_000)
+        if record_flags & FLAG_ERROR:
+            raise OSError(19, "No such device (replayed)")
+        return data
+
+    def try_lock(self):
+        """The bus is always available"""
+        return True
+
+    def unlock(self):
+        """Nothing to do"""
+
+    def deinit(self):
+        """Nothing to release"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.deinit()
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        """Check the write against the trace"""
+        if end is None:
+            end = len(buffer)
+        data = self._next(0, address, end - start)
+        if self.strict and data != bytes(buffer[start:end]):
+            raise ValueError(
+                f"trace diverged: wrote {bytes(buffer[start:end])} instead of {data}"
+            )
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        """Read the data from the trace"""
+        if end is None:
+            end = len(buffer)
+        buffer[start:end] = self._next(FLAG_READ, address, end - start)
+
+    def writeto_then_readfrom(
+        self,
+        address,
+        buffer_out,
+        buffer_in,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None,
+    ):
+        """Write then read, as two transactions"""
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
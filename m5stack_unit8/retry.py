@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=protected-access
+"""
+`m5stack_unit8.retry`
+================================================================================
+
+Retry policy for transient I2C errors, see the ``retry`` argument of the drivers.
+
+
+* Author(s): Neradoc
+"""
+
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+
+class RetryPolicy:
+    """
+    How failed transactions are retried.
+
+    :param int attempts: the maximum number of attempts of a transaction.
+    :param float backoff: seconds to wait before the first retry, doubled for
+      each following retry.
+    :param float budget: the maximum time in seconds spent retrying during one
+      operation (a read of all channels for example).
+    """
+
+    def __init__(self, attempts=3, backoff=0.0005, budget=0.01):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.budget = budget
+
+    def deadline(self):
+        """The time after which an operation starting now stops retrying"""
+        return time.monotonic() + self.budget
+
+    def wait(self, attempt, deadline):
+        """
+        Wait before retrying a transaction that failed ``attempt`` times,
+        return False if it should not be retried.
+        """
+        if attempt >= self.attempts:
+            return False
+        delay = self.backoff * (1 << (attempt - 1))
+        if time.monotonic() + delay > deadline:
+            return False
+        if delay:
+            time.sleep(delay)
+        return True
+
+
+def transfer(
+    unit, bus, buffer, start, end, register=None, deadline=None, partial=False
+):
+    """
+    Do one transaction of a driver, retrying failures with its ``_backoff``:
+    write the buffer from start to end, or if a register is given, write it
+    then read into the buffer from start to end.
+    Return False if it still failed and ``partial`` results are allowed,
+    which requires the driver to have a retry policy, raise otherwise.
+    """
+    attempt = 0
+    while True:
+        try:
+            if register is None:
+                bus.write(buffer, start=start, end=end)
+            else:
+                unit.register[0] = register
+                bus.write(unit.register)
+                bus.readinto(buffer, start=start, end=end)
+            return True
+        except OSError as error:
+            attempt += 1
+            if deadline is None:
+                deadline = unit._deadline()
+            if unit._backoff(attempt, deadline, error):
+                continue
+            if partial and unit.retry is not None:
+                return False
+            raise
@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes
+"""
+`m5stack_unit8.scheduler`
+================================================================================
+
+Poll a Unit8 board at a rate that follows the activity of its inputs.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The board is read with ``snapshot()`` at the ``fast`` rate while its inputs
+change. After ``idle`` seconds without change, it is read at the ``slow`` rate,
+but the switch (and the buttons of the encoder board), which take a single
+short read, are still checked at the ``wake`` rate, and a change there goes
+back to the fast rate immediately.
+
+.. code-block:: python
+
+    scheduler = AdaptiveScheduler(encoder, fast=100, slow=2, idle=5)
+    while True:
+        state = scheduler.poll()
+        if state:
+            print(state.positions)
+        scheduler.sleep()
+"""
+
+import array
+import time
+from m5stack_unit8.encoder import Unit8Encoder
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+
+class AdaptiveScheduler:
+    """
+    Poll a :py:class:`~m5stack_unit8.encoder.Unit8Encoder` or a
+    :py:class:`~m5stack_unit8.angle.Unit8Angle` at an adaptive rate.
+
+    :param unit: the board to poll.
+    :param float fast: the full reads per second while active.
+    :param float slow: the full reads per second while idle.
+    :param float wake: the reads per second of the switch and buttons while idle.
+    :param float idle: seconds without change before slowing down.
+    :param int threshold: minimal change of an angle (16 bits) that counts as activity.
+    """
+
+    def __init__(self, unit, fast=100, slow=2, wake=20, idle=2.0, threshold=256):
+        self.unit = unit
+        self.fast = fast
+        self.slow = slow
+        self.wake = wake
+        self.idle = idle
+        self.threshold = threshold
+        self.state = None
+        self.active = True
+        self.next_time = 0
+        self._encoder = isinstance(unit, Unit8Encoder)
+        self._angles = array.array("H", [0] * 8)
+        self._inputs = None
+        self._last_activity = time.monotonic()
+        self._next_read = 0
+        self.reset_stats()
+
+    @property
+    def rate(self):
+        """The current rate of the full reads, per second"""
+        return self.fast if self.active else self.slow
+
+    def reset_stats(self):
+        """Restart the counters of :py:meth:`stats`"""
+        self.reads = 0
+        self.wake_checks = 0
+        self.wakeups = 0
+        self.busy_time = 0.0
+        self._stats_start = time.monotonic()
+
+    def stats(self, reset=False):
+        """
+        Return a dict with the number of full reads and wake checks, the number
+        of wake ups, the current rate and the duty cycle: the fraction of the
+        time spent polling since the counters were reset.
+        """
+        elapsed = time.monotonic() - self._stats_start
+        stats = {
+            "rate": self.rate,
+            "active": self.active,
+            "reads": self.reads,
+            "wake_checks": self.wake_checks,
+            "wakeups": self.wakeups,
+            "busy_time": self.busy_time,
+            "duty_cycle": self.busy_time / elapsed if elapsed > 0 else 0.0,
+        }
+        if reset:
+            self.reset_stats()
+        return stats
+
+    def _wake_inputs(self):
+        """Read the switch and buttons, in one int"""
+        unit = self.unit
+        if self._encoder:
+            buttons = unit.buttons_mask
+            return self._hold(buttons | unit.switch << 8, unit.valid | 0x100)
+        return int(unit.switch)
+
+    def _hold(self, inputs, valid):
+        """Keep the last value of the inputs that could not be read"""
+        if self._inputs is None:
+            return inputs
+        return inputs & valid | self._inputs & ~valid & 0x1FF
+
+    def _changed(self, state):
+        """Whether a full read shows activity, and remember its values"""
+        valid = state.valid
+        if self._encoder:
+            inputs = self._hold(state.buttons | state.switch << 8, valid)
+            changed = any(state.increments)
+        else:
+            inputs = int(state.switch) if valid & 0x100 else self._inputs
+            changed = False
+            angles = self._angles
+            for num in range(8):
+                if not valid & (1 << num):
+                    continue
+                if abs(state.angles[num] - angles[num]) >= self.threshold:
+                    angles[num] = state.angles[num]
+                    changed = True
+        changed = changed or inputs != self._inputs
+        self._inputs = inputs
+        return changed
+
+    def poll(self, now=None):
+        """
+        Do the read that is due, if any. Return the state of the board
+        when it was fully read, None otherwise.
+        """
+        if now is None:
+            now = time.monotonic()
+        if now < self.next_time:
+            return None
+        start = time.monotonic()
+        state = None
+        if self.active or now >= self._next_read:
+            self.state = state = self.unit.snapshot(self.state)
+            self.reads += 1
+            if self._changed(state):
+                self._last_activity = now
+                self.active = True
+            elif self.active and now - self._last_activity >= self.idle:
+                self.active = False
+            self._next_read = now + 1 / self.rate
+        else:
+            self.wake_checks += 1
+            inputs = self._wake_inputs()
+            if inputs != self._inputs:
+                # read everything right away at the fast rate
+                self.wakeups += 1
+                self.active = True
+                self._last_activity = now
+                self.state = state = self.unit.snapshot(self.state)
+                self.reads += 1
+                self._changed(state)
+                self._next_read = now + 1 / self.fast
+        self.busy_time += time.monotonic() - start
+        if self.active:
+            self.next_time = self._next_read
+        else:
+            self.next_time = min(self._next_read, now + 1 / self.wake)
+        return state
+
+    def sleep(self):
+        """Sleep until the next read is due"""
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,384 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+# pylint: disable=too-many-instance-attributes
+"""
+`m5stack_unit8.shared_state`
+================================================================================
+
+Share the state of a Unit8 board between processes, for Linux hosts using
+Blinka: one process owns and polls the board, the others read its state from
+shared memory and send it commands.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The :py:class:`StatePublisher` writes the state of each read into a fixed
+layout record in a ``multiprocessing.shared_memory`` segment, protected by a
+sequence counter (seqlock): it is odd while the record is being written, and
+:py:class:`StateReader` reads the record again if the counter changed during
+its read. Reading is only ``struct.unpack_from`` calls on the shared memory.
+
+LED and position writes go through command rings in the same segment. Each
+ring has a single producer (one reader process per ring) and the publisher as
+the single consumer, so that the head and tail indexes need no lock. Commands
+are executed in a batch before each read of the board.
+
+.. code-block:: python
+
+    # in the process that owns the board
+    publisher = StatePublisher(Unit8Encoder(board.I2C()), rate=100)
+    publisher.run()
+
+    # in other processes
+    reader = StateReader(ring=0)
+    state = reader.read()
+    reader.set_led(0, 0xFF0000)
+
+**Software and Dependencies:**
+
+* Adafruit Blinka: https://github.com/adafruit/Adafruit_Blinka
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from m5stack_unit8.encoder import Unit8Encoder
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+DEFAULT_NAME = "m5stack_unit8"
+KIND_ENCODER = 1
+KIND_ANGLE = 2
+
+CMD_SET_LED = 1
+CMD_SET_POSITION = 2
+CMD_RESET = 3
+
+_MAGIC = b"U8SM"
+_VERSION = 1
+# magic, version, kind, number of rings, ring size
+_HEADER = struct.Struct("<4sBBBB")
+_SEQUENCE = struct.Struct("<I")
+_SEQUENCE_OFFSET = 8
+# pid of the resource tracker of the publisher, 0 if unknown
+_TRACKER = struct.Struct("<I")
+_TRACKER_OFFSET = 12
+_RECORD_OFFSET = 16
+# timestamp, reads, valid, switch, buttons, positions, increments, angles
+_RECORD = struct.Struct("<dIHBB8q8l8H")
+_RINGS_OFFSET = _RECORD_OFFSET + _RECORD.size
+# head (written by the producer), tail (written by the publisher)
+_INDEX = struct.Struct("<I")
+# command, channel, brightness, value
+_COMMAND = struct.Struct("<BBH4xq")
+
+
+def _ring_offset(ring, size):
+    return _RINGS_OFFSET + ring * (8 + size * _COMMAND.size)
+
+
+class SharedState:
+    """
+    The state of a board as published in shared memory. The channel values
+    are tuples, ``positions``, ``increments`` and ``buttons`` are those of an
+    encoder board, ``angles`` those of an angle board, the others are 0.
+    """
+
+    __slots__ = (
+        "kind",
+        "sequence",
+        "timestamp",
+        "reads",
+        "valid",
+        "switch",
+        "buttons",
+        "positions",
+        "increments",
+        "angles",
+    )
+
+    def __init__(self):
+        self.kind = 0
+        self.sequence = 0
+        self.timestamp = 0.0
+        self.reads = 0
+        self.valid = 0
+        self.switch = False
+        self.buttons = 0
+        self.positions = (0,) * 8
+        self.increments = (0,) * 8
+        self.angles = (0,) * 8
+
+
+class StatePublisher:
+    """
+    Poll a :py:class:`~m5stack_unit8.encoder.Unit8Encoder` or
+    :py:class:`~m5stack_unit8.angle.Unit8Angle` and publish its state.
+
+    :param unit: the board.
+    :param str name: the name of the shared memory segment.
+    :param float rate: the reads per second.
+    :param int rings: the number of command rings (of reader processes).
+    :param int ring_size: the number of commands a ring can hold.
+    """
+
+    def __init__(self, unit, name=DEFAULT_NAME, rate=100, rings=4, ring_size=64):
+        if rings not in range(1, 256):
+            raise ValueError("rings must be one of 1-255")
+        if ring_size not in range(1, 256):
+            raise ValueError("ring_size must be one of 1-255")
+        self.unit = unit
+        self.name = name
+        self.rate = rate
+        self.rings = rings
+        self.ring_size = ring_size
+        self.errors = 0
+        self.last_error = None
+        self.reads = 0
+        self._encoder = isinstance(unit, Unit8Encoder)
+        self._state = None
+        self._running = False
+        self._sequence = 0
+        self.memory = shared_memory.SharedMemory(
+            name, create=True, size=_ring_offset(rings, ring_size)
+        )
+        kind = KIND_ENCODER if self._encoder else KIND_ANGLE
+        _HEADER.pack_into(self.memory.buf, 0, _MAGIC, _VERSION, kind, rings, ring_size)
+        _TRACKER.pack_into(self.memory.buf, _TRACKER_OFFSET, _tracker_pid())
+
+    def close(self):
+        """Stop publishing and remove the shared memory segment"""
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def stop(self):
+        """Make :py:meth:`run` return"""
+        self._running = False
+
+    def run(self):
+        """Poll and publish ``rate`` times per second until stopped"""
+        self._running = True
+        while self._running:
+            start = time.monotonic()
+            self.poll()
+            elapsed = time.monotonic() - start
+            time.sleep(max(0, 1 / self.rate - elapsed))
+
+    def poll(self):
+        """Execute the pending commands, read the board and publish its state"""
+        try:
+            with self.unit.batch():
+                for ring in range(self.rings):
+                    self._execute(ring)
+            self._state = state = self.unit.snapshot(self._state)
+            self.reads += 1
+            self._publish(state)
+        except OSError as error:
+            self.errors += 1
+            self.last_error = error
+
+    def _execute(self, ring):
+        """Run the commands waiting in a ring"""
+        buffer = self.memory.buf
+        offset = _ring_offset(ring, self.ring_size)
+        (head,) = _INDEX.unpack_from(buffer, offset)
+        (tail,) = _INDEX.unpack_from(buffer, offset + 4)
+        while tail != head:
+            slot = offset + 8 + (tail % self.ring_size) * _COMMAND.size
+            command, channel, brightness, value = _COMMAND.unpack_from(buffer, slot)
+            tail = (tail + 1) & 0xFFFFFFFF
+            _INDEX.pack_into(buffer, offset + 4, tail)
+            try:
+                self._command(command, channel, brightness, value)
+            except (ValueError, OverflowError, struct.error) as error:
+                # a bad command is dropped, the others still run
+                self.errors += 1
+                self.last_error = error
+
+    def _command(self, command, channel, brightness, value):
+        if command == CMD_SET_LED:
+            if self._encoder:
+                self.unit.set_led(channel, value)
+            else:
+                self.unit.set_led(channel, value, brightness)
+        elif command == CMD_SET_POSITION and self._encoder:
+            self.unit.set_position(channel, value)
+        elif command == CMD_RESET and self._encoder:
+            self.unit.reset()
+
+    def _publish(self, state):
+        buffer = self.memory.buf
+        zeros = (0,) * 8
+        if self._encoder:
+            values = (state.buttons, *state.positions, *state.increments, *zeros)
+        else:
+            values = (0, *zeros, *zeros, *state.angles)
+        # odd while writing
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, self._sequence)
+        _RECORD.pack_into(
+            buffer,
+            _RECORD_OFFSET,
+            state.timestamp,
+            self.reads & 0xFFFFFFFF,
+            state.valid,
+            state.switch,
+            *values,
+        )
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, self._sequence)
+
+
+class StateReader:
+    """
+    Read the state published by a :py:class:`StatePublisher` in another process.
+
+    :param str name: the name of the shared memory segment.
+    :param int ring: the command ring used by this reader, None if it doesn't
+      send commands. Only one process may use a given ring.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, ring=None):
+        self.memory = _attach(name)
+        buffer = self.memory.buf
+        magic, version, self.kind, rings, self.ring_size = _HEADER.unpack_from(
+            buffer, 0
+        )
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{name} is not a Unit8 state segment")
+        if ring is not None and ring not in range(rings):
+            raise ValueError(f"ring must be one of 0-{rings - 1}")
+        self.ring = ring
+
+    def close(self):
+        """Detach from the shared memory segment"""
+        self.memory.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    @property
+    def sequence(self):
+        """The sequence counter, it changes each time a state is published"""
+        return _SEQUENCE.unpack_from(self.memory.buf, _SEQUENCE_OFFSET)[0]
+
+    def read(self, state=None, timeout=0.1):
+        """
+        Return the last published state, updating ``state`` or a new
+        :py:class:`SharedState`.
+
+        :param float timeout: raise ``TimeoutError`` if no consistent record
+          could be read in that time (the publisher stopped while writing).
+        """
+        if state is None:
+            state = SharedState()
+        buffer = self.memory.buf
+        deadline = time.monotonic() + timeout
+        while True:
+            (sequence,) = _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)
+            if not sequence & 1:
+                values = _RECORD.unpack_from(buffer, _RECORD_OFFSET)
+                if _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0] == sequence:
+                    break
+            if time.monotonic() > deadline:
+                raise TimeoutError("the state is not published consistently")
+            # let the publisher finish writing
+            time.sleep(0)
+        state.kind = self.kind
+        state.sequence = sequence
+        state.timestamp, state.reads, state.valid, switch, state.buttons = values[:5]
+        state.switch = bool(switch)
+        state.positions = values[5:13]
+        state.increments = values[13:21]
+        state.angles = values[21:29]
+        return state
+
+    def _send(self, command, channel=0, value=0, brightness=0):
+        """Add a command to the ring, return False if the ring is full"""
+        if self.ring is None:
+            raise RuntimeError("this reader has no command ring")
+        buffer = self.memory.buf
+        offset = _ring_offset(self.ring, self.ring_size)
+        (head,) = _INDEX.unpack_from(buffer, offset)
+        (tail,) = _INDEX.unpack_from(buffer, offset + 4)
+        if (head - tail) & 0xFFFFFFFF >= self.ring_size:
+            return False
+        slot = offset + 8 + (head % self.ring_size) * _COMMAND.size
+        _COMMAND.pack_into(buffer, slot, command, channel, brightness, value)
+        # the command is visible to the publisher when the head moves
+        _INDEX.pack_into(buffer, offset, (head + 1) & 0xFFFFFFFF)
+        return True
+
+    def set_led(self, position, color, brightness=100):
+        """Set an LED to a color (and brightness on the angle board)"""
+        if position not in range(0, 9):
+            raise ValueError("pixel position must be one of 0-8")
+        if not 0 <= brightness <= 100:
+            raise ValueError("brightness must be 0-100")
+        if isinstance(color, (tuple, list)) and len(color) == 3:
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        if not isinstance(color, int) or not 0 <= color <= 0xFFFFFF:
+            raise ValueError("color must be an int or (r,g,b) tuple")
+        return self._send(CMD_SET_LED, position, color, brightness)
+
+    def set_position(self, num, position):
+        """Set the position of one encoder"""
+        if num not in range(0, 8):
+            raise ValueError("num must be one of 0-7")
+        if not -0x80000000 <= position <= 0x7FFFFFFF:
+            raise ValueError("position must fit in 32 bits")
+        return self._send(CMD_SET_POSITION, num, position)
+
+    def reset(self):
+        """Reset the encoder positions"""
+        return self._send(CMD_RESET)
+
+
+def _attach(name):
+    """Attach to an existing segment without letting this process destroy it"""
+    try:
+        # pylint: disable=unexpected-keyword-arg
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # before Python 3.13 the resource tracker unlinks the segment on exit
+    memory = shared_memory.SharedMemory(name)
+    (owner,) = _TRACKER.unpack_from(memory.buf, _TRACKER_OFFSET)
+    if owner and owner == _tracker_pid():
+        # the publisher shares our tracker (same process or forked from it),
+        # the segment stays registered for its cleanup
+        return memory
+    try:
+        # pylint: disable=import-outside-toplevel, protected-access
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(memory._name, "shared_memory")
+    except (ImportError, AttributeError):
+        pass
+    return memory
+
+
+def _tracker_pid():
+    """The pid of the resource tracker of this process, 0 if not known"""
+    try:
+        # pylint: disable=import-outside-toplevel, protected-access
+        from multiprocessing import resource_tracker
+
+        return resource_tracker._resource_tracker._pid or 0
+    except (ImportError, AttributeError):
+        return 0
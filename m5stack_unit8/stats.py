@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods, too-many-arguments
+"""
+`m5stack_unit8.stats`
+================================================================================
+
+Record the bus transactions of a driver, see the ``instrument()`` and
+``stats()`` methods of the drivers.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+The register of a read is the last register written, since the drivers write
+the register address before each read. Durations are measured with
+``time.monotonic_ns()`` when available. A sweep of the channels in one combined
+transaction (see :py:class:`~m5stack_unit8.i2cdev.I2CDev`) is recorded as a read
+of each channel, sharing the duration of the sweep.
+"""
+
+import time
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+BUCKETS = (100, 200, 500, 1000, 2000, 5000, 10000)
+"""Upper bounds of the latency histogram buckets in microseconds, plus one for longer."""
+
+_MONOTONIC_NS = hasattr(time, "monotonic_ns")
+
+
+def _now_us():
+    if _MONOTONIC_NS:
+        return time.monotonic_ns() // 1000
+    return int(time.monotonic() * 1_000_000)
+
+
+class _RegisterStats:
+    """Counters of the transactions of one register."""
+
+    __slots__ = ("reads", "writes", "bytes", "errors", "time_us", "max_us", "histogram")
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.bytes = 0
+        self.errors = 0
+        self.time_us = 0
+        self.max_us = 0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def as_dict(self):
+        """The counters as a dict"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BusStats:
+    """
+    Counters and latency histograms of bus transactions, by register.
+    ``hooks`` are called with ``(register, is_write, count, duration_us, error)``
+    for every transaction, ``error`` being the exception or None.
+    """
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.registers = {}
+
+    def reset(self):
+        """Clear the counters"""
+        self.registers = {}
+
+    def record(self, register, is_write, count, duration, error=None):
+        """Record a transaction, duration in microseconds"""
+        stats = self.registers.get(register)
+        if stats is None:
+            stats = self.registers[register] = _RegisterStats()
+        if is_write:
+            stats.writes += 1
+        else:
+            stats.reads += 1
+        stats.bytes += count
+        stats.time_us += duration
+        stats.max_us = max(stats.max_us, duration)
+        if error is not None:
+            stats.errors += 1
+        bucket = 0
+        while bucket < len(BUCKETS) and duration > BUCKETS[bucket]:
+            bucket += 1
+        stats.histogram[bucket] += 1
+        for hook in self.hooks:
+            hook(register, is_write, count, duration, error)
+
+    def as_dict(self, reset=False):
+        """
+        The totals and the counters of each register as a dict:
+        ``transactions``, ``bytes``, ``errors``, ``time_us``, ``buckets``
+        and ``registers``, a dict by register with ``reads``, ``writes``,
+        ``bytes``, ``errors``, ``time_us``, ``max_us`` and ``histogram``.
+        Clear the counters if ``reset`` is True.
+        """
+        registers = {reg: stats.as_dict() for reg, stats in self.registers.items()}
+        if reset:
+            self.reset()
+        values = registers.values()
+        return {
+            "transactions": sum(reg["reads"] + reg["writes"] for reg in values),
+            "bytes": sum(reg["bytes"] for reg in values),
+            "errors": sum(reg["errors"] for reg in values),
+            "time_us": sum(reg["time_us"] for reg in values),
+            "buckets": BUCKETS,
+            "registers": registers,
+        }
+
+
+def instrument(device, hooks=()):
+    """Wrap an ``I2CDevice`` in an InstrumentedDevice if not done yet, add hooks"""
+    if not isinstance(device, InstrumentedDevice):
+        device = InstrumentedDevice(device)
+    device.stats.hooks.extend(hooks)
+    return device
+
+
+class InstrumentedDevice:
+    """Wrap an ``I2CDevice`` and record its transactions in a BusStats."""
+
+    def __init__(self, device, stats=None):
+        self.device = device
+        self.stats = BusStats() if stats is None else stats
+        self._register = None
+
+    @property
+    def device_address(self):
+        """The address of the wrapped device"""
+        return self.device.device_address
+
+    @device_address.setter
+    def device_address(self, address):
+        self.device.device_address = address
+
+    @property
+    def i2c(self):
+        """The bus of the wrapped device"""
+        return self.device.i2c
+
+    def __enter__(self):
+        self.device.__enter__()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        return self.device.__exit__(exception_type, exception_value, traceback)
+
+    def _call(self, function, register, is_write, count, *args, **kwargs):
+        start = _now_us()
+        try:
+            function(*args, **kwargs)
+        except OSError as error:
+            self.stats.record(register, is_write, count, _now_us() - start, error)
+            raise
+        self.stats.record(register, is_write, count, _now_us() - start)
+
+    def write(self, buf, *, start=0, end=None):
+        """Write and record the transaction"""
+        if end is None:
+            end = len(buf)
+        if end > start:
+            self._register = buf[start]
+        self._call(
+            self.device.write,
+            self._register,
+            True,
+            end - start,
+            buf,
+            start=start,
+            end=end,
+        )
+
+    def readinto(self, buf, *, start=0, end=None):
+        """Read and record the transaction"""
+        if end is None:
+            end = len(buf)
+        self._call(
+            self.device.readinto,
+            self._register,
+            False,
+            end - start,
+            buf,
+            start=start,
+            end=end,
+        )
+
+    def write_then_readinto(
+        self,
+        out_buffer,
+        in_buffer,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None,
+    ):
+        """Write then read, recorded as two transactions"""
+        self.write(out_buffer, start=out_start, end=out_end)
+        self.readinto(in_buffer, start=in_start, end=in_end)
+
+    def sweep(self, register, width, count, buffer):
+        """Sweep the channels with the bus and record a read of each channel"""
+        start = _now_us()
+        error = None
+        try:
+            self.device.i2c.sweep(
+                self.device.device_address, register, width, count, buffer
+            )
+        except OSError as sweep_error:
+            error = sweep_error
+            raise
+        finally:
+            duration = (_now_us() - start) // count
+            for num in range(count):
+                self.stats.record(register + num * width, False, width, duration, error)
@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=line-too-long, too-few-public-methods
+"""
+`m5stack_unit8.thread_poller`
+================================================================================
+
+Poll a Unit8 board from a background thread and cache the latest values,
+for Linux hosts using Blinka.
+
+
+* Author(s): Neradoc
+
+Implementation Notes
+--------------------
+
+Only the poller thread uses the bus. Each field of the cache is replaced by a
+new ``(value, updated_at, changed_at)`` tuple in a single assignment, so the
+readers never wait on a lock and always get a consistent value.
+
+Writes to the board (LEDs, positions...) should be submitted with
+:py:meth:`ThreadPoller.submit` to run on the poller thread between two reads.
+
+**Software and Dependencies:**
+
+* Adafruit Blinka: https://github.com/adafruit/Adafruit_Blinka
+"""
+
+import queue
+import threading
+import time
+from m5stack_unit8.encoder import Unit8Encoder
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/Neradoc/CircuitPython_m5stack_unit8.git"
+
+ENCODER_FIELDS = ("positions", "increments", "buttons", "switch")
+ANGLE_FIELDS = ("angles", "switch")
+
+
+class ThreadPoller:
+    """
+    Read a :py:class:`~m5stack_unit8.encoder.Unit8Encoder` or
+    :py:class:`~m5stack_unit8.angle.Unit8Angle` ``rate`` times per second
+    with ``snapshot()`` in a daemon thread.
+
+    The cached fields are ``positions``, ``increments`` (of the last read),
+    ``buttons`` (bitmask) and ``switch`` for the encoder, ``angles`` and
+    ``switch`` for the angle board. The channel values are tuples.
+    The channels that could not be read (see ``valid`` in the snapshots) keep
+    their previous value.
+    """
+
+    def __init__(self, unit, rate=100):
+        self.unit = unit
+        self.rate = rate
+        self.errors = 0
+        self.last_error = None
+        if isinstance(unit, Unit8Encoder):
+            self.fields = ENCODER_FIELDS
+        else:
+            self.fields = ANGLE_FIELDS
+        self._cache = {field: (None, 0.0, 0.0) for field in self.fields}
+        self._commands = queue.SimpleQueue()
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the polling thread."""
+        if self._thread is None:
+            self._running.set()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the polling thread and wait for it to end."""
+        if self._thread is not None:
+            self._running.clear()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.stop()
+
+    def submit(self, function, *args):
+        """
+        Call ``function(*args)`` on the poller thread, before the next read.
+        Its exceptions are counted in ``errors`` and kept in ``last_error``.
+        """
+        self._commands.put((function, args))
+
+    def get(self, field):
+        """The latest value of a field, None before the first read."""
+        return self._cache[field][0]
+
+    def entry(self, field):
+        """
+        The latest ``(value, updated_at, changed_at)`` of a field,
+        the times are ``time.monotonic()`` of the last read and last change.
+        """
+        return self._cache[field]
+
+    def age(self, field, now=None):
+        """Seconds since the field was last read."""
+        if now is None:
+            now = time.monotonic()
+        return now - self._cache[field][1]
+
+    def is_stale(self, field, max_age):
+        """Whether the field was last read more than ``max_age`` seconds ago."""
+        return self.age(field) > max_age
+
+    def _run(self):
+        state = None
+        while self._running.is_set():
+            start = time.monotonic()
+            while not self._commands.empty():
+                function, args = self._commands.get_nowait()
+                try:
+                    function(*args)
+                except Exception as error:  # pylint: disable=broad-except
+                    # a failing command must not stop the thread
+                    self.errors += 1
+                    self.last_error = error
+            try:
+                state = self.unit.snapshot(state)
+                self._publish(state)
+            except OSError as error:
+                self.errors += 1
+                self.last_error = error
+            elapsed = time.monotonic() - start
+            time.sleep(max(0, 1 / self.rate - elapsed))
+
+    def _publish(self, state):
+        cache = self._cache
+        now = state.timestamp
+        valid = state.valid
+        for field in self.fields:
+            value = getattr(state, field)
+            old, _, changed_at = cache[field]
+            if old is None:
+                pass
+            elif field == "switch":
+                if not valid & 0x100:
+                    value = old
+            elif field == "buttons":
+                value = value & valid | old & ~valid & 0xFF
+            elif field != "increments":
+                # the channels that could not be read keep their value
+                value = [
+                    value[num] if valid & (1 << num) else old[num] for num in range(8)
+                ]
+            if not isinstance(value, (int, bool)):
+                value = tuple(value)
+            if value != old:
+                changed_at = now
+            cache[field] = (value, now, changed_at)
@@ -0,0 +1,32 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import pytest
+from m5stack_unit8.angle import Unit8Angle
+from m5stack_unit8.emulator import FakeI2C, Unit8AngleEmulator, Unit8EncoderEmulator
+from m5stack_unit8.encoder import Unit8Encoder
+
+
+@pytest.fixture(name="auto_increment", params=[True, False], ids=["auto", "no-auto"])
+def fixture_auto_increment(request):
+    """Whether the emulated firmware auto-increments the register on reads"""
+    return request.param
+
+
+@pytest.fixture(name="board")
+def fixture_board(auto_increment):
+    """An emulated encoder board, its bus and its driver"""
+    emulator = Unit8EncoderEmulator(auto_increment=auto_increment)
+    bus = FakeI2C(emulator)
+    return emulator, bus, Unit8Encoder(bus)
+
+
+@pytest.fixture(name="angle_board")
+def fixture_angle_board(auto_increment):
+    """An emulated angle board with knob n at 500 * n, its bus and its driver"""
+    emulator = Unit8AngleEmulator(auto_increment=auto_increment)
+    bus = FakeI2C(emulator)
+    angle = Unit8Angle(bus, delay=0)
+    for num in range(8):
+        emulator.set_angle(num, 500 * num)
+    return emulator, bus, angle
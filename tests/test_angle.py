@@ -0,0 +1,49 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+from m5stack_unit8.angle import PRECISION_8BITS
+
+
+def test_read_angles(angle_board):
+    _, bus, angle = angle_board
+    bus.reset_counters()
+    assert angle.angles_12bit == tuple(500 * num for num in range(8))
+    assert bus.transactions == 16
+    assert angle.angles == tuple(500 * num * 0xFFFF // 0xFFF for num in range(8))
+    assert angle.get_angle(7) == 3500 * 0xFFFF // 0xFFF
+
+
+def test_read_8bits(angle_board):
+    _, _, angle = angle_board
+    raw = tuple((500 * num) >> 4 for num in range(8))
+    assert angle.angles_8bit == raw
+    angle.precision = PRECISION_8BITS
+    assert angle.angles == tuple(value * 0xFFFF // 0xFF for value in raw)
+
+
+def test_snapshot(angle_board):
+    emulator, _, angle = angle_board
+    emulator.set_switch(True)
+    state = angle.snapshot()
+    assert state.switch
+    assert state.valid == 0x1FF
+    assert tuple(state.angles) == angle.angles
+
+
+def test_leds(angle_board):
+    emulator, _, angle = angle_board
+    angle.set_led(2, 0x102030, 50)
+    assert emulator.led(2) == (0x10, 0x20, 0x30, 50)
+    assert angle.get_led_brightness(2) == 50
+
+
+def test_coarse_after_raw_read(angle_board):
+    emulator, _, angle = angle_board
+    angle.angles  # pylint: disable=pointless-statement
+    assert angle.angles_coarse == tuple(500 * num >> 4 for num in range(8))
+    emulator.set_angle(2, 4000)
+    assert angle.angles_12bit[2] == 4000
+    assert angle.angles_coarse[2] == 4000 >> 4
+    emulator.set_angle(3, 16)
+    assert angle.get_angle_12bit(3) == 16
+    assert angle.angles_coarse[3] == 1
@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import asyncio
+from m5stack_unit8.async_poller import AsyncPoller
+from m5stack_unit8.encoder import Unit8Encoder
+from m5stack_unit8.events import BUTTON_PRESS, ENCODER_DELTA
+
+
+async def poll_counting_yields(poller):
+    """Poll once, return how many times another task ran meanwhile"""
+    count = 0
+    polling = True
+
+    async def other_task():
+        nonlocal count
+        while polling:
+            count += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(other_task())
+    await poller.poll()
+    polling = False
+    await task
+    return count
+
+
+def test_events(board):
+    emulator, _, encoder = board
+    poller = AsyncPoller(encoder)
+    asyncio.run(poller.poll())
+    emulator.turn(3, -4)
+    emulator.press(5)
+    asyncio.run(poller.poll())
+    events = []
+    while not poller.queue.empty():
+        events.append(poller.queue.get_nowait())
+    assert [(e.kind, e.channel, e.value) for e in events] == [
+        (ENCODER_DELTA, 3, -4),
+        (BUTTON_PRESS, 5, True),
+    ]
+
+
+def test_yields_per_channel(board):
+    _, _, encoder = board
+    poller = AsyncPoller(encoder)
+    count = asyncio.run(poll_counting_yields(poller))
+    assert count >= (2 if encoder.burst else 16)
+
+
+def test_tracking_wide_positions(board):
+    emulator, bus, encoder = board
+    encoder = Unit8Encoder(bus, burst=encoder.burst, tracking=True)
+    poller = AsyncPoller(encoder)
+    encoder.set_position(6, 2**70)
+    asyncio.run(poller.poll())
+    emulator.turn(6, 2)
+    asyncio.run(poller.poll())
+    event = poller.queue.get_nowait()
+    assert (event.kind, event.channel, event.value) == (ENCODER_DELTA, 6, 2)
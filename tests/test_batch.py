@@ -0,0 +1,64 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import pytest
+from m5stack_unit8.emulator import FakeI2C, Unit8EncoderEmulator
+from m5stack_unit8.encoder import Unit8Encoder
+
+
+@pytest.fixture(name="turned")
+def fixture_turned(board):
+    """The encoder board with encoder n turned by 10 + n"""
+    emulator, _, encoder = board
+    for num in range(8):
+        emulator.turn(num, 10 + num)
+    return emulator, encoder
+
+
+def test_position_after_reset_wins(turned):
+    emulator, encoder = turned
+    with encoder.batch():
+        encoder.reset()
+        encoder.set_position(3, 100)
+    assert emulator.position(3) == 100
+    assert encoder.get_written_position(3) == 100
+    assert emulator.position(2) == 0
+
+
+def test_reset_after_position_wins(turned):
+    emulator, encoder = turned
+    with encoder.batch():
+        encoder.set_position(3, 100)
+        encoder.reset()
+    assert emulator.position(3) == 0
+    assert encoder.get_written_position(3) == 0
+
+
+def test_last_write_wins(turned):
+    emulator, encoder = turned
+    with encoder.batch():
+        encoder.set_position(5, 1)
+        encoder.set_led(2, 0x010203)
+        encoder.set_position(5, -2)
+        encoder.set_led(2, 0x040506)
+    assert emulator.position(5) == -2
+    assert emulator.led(2) == (4, 5, 6)
+
+
+def test_burst_reset_is_one_write():
+    emulator = Unit8EncoderEmulator()
+    bus = FakeI2C(emulator)
+    encoder = Unit8Encoder(bus)
+    bus.reset_counters()
+    encoder.reset()
+    assert bus.transactions == 1
+    assert encoder.positions == (0,) * 8
+
+
+def test_exception_discards(turned):
+    emulator, encoder = turned
+    with pytest.raises(KeyError):
+        with encoder.batch():
+            encoder.set_position(0, 42)
+            raise KeyError
+    assert emulator.position(0) == 10
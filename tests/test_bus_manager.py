@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+from m5stack_unit8.bus_manager import BusManager
+from m5stack_unit8.emulator import FakeI2C, Unit8EncoderEmulator
+from m5stack_unit8.encoder import Unit8Encoder
+
+
+class FakeMux:
+    """A multiplexer, its boards only answer when their channel is selected"""
+
+    address = 0x70
+
+    def __init__(self):
+        self.selection = 0
+
+    def write(self, data):
+        if data:
+            self.selection = data[0]
+
+    def read(self, buffer, start, end):
+        buffer[start:end] = bytes([self.selection]) * (end - start)
+
+
+class MuxedBoard:
+    """An emulated board on a channel of a FakeMux"""
+
+    def __init__(self, mux, channel, board):
+        self.mux = mux
+        self.channel = channel
+        self.board = board
+
+    @property
+    def address(self):
+        if self.mux.selection & (1 << self.channel):
+            return self.board.address
+        return None
+
+    def write(self, data):
+        self.board.write(data)
+
+    def read(self, buffer, start, end):
+        self.board.read(buffer, start, end)
+
+
+def test_main_bus_deselects_mux():
+    mux = FakeMux()
+    main = Unit8EncoderEmulator()
+    muxed = Unit8EncoderEmulator()
+    main.turn(0, 5)
+    muxed.turn(0, -9)
+    bus = FakeI2C(main, mux, MuxedBoard(mux, 3, muxed))
+    manager = BusManager(bus)
+    manager.add(Unit8Encoder(bus, burst=True), name="main")
+    manager.select(3)
+    manager.add(Unit8Encoder(bus, burst=True), name="muxed", channel=3)
+    manager.select(None)
+    assert mux.selection == 0
+    manager.poll(now=0)
+    states = manager.states
+    assert states["main"].positions[0] == 5
+    assert states["muxed"].positions[0] == -9
+    assert manager.switches == 3
+    manager.poll(now=1)
+    assert manager.states["main"].positions[0] == 5
+
+
+def test_failing_board_is_skipped():
+    first = Unit8EncoderEmulator()
+    second = Unit8EncoderEmulator(address=0x42)
+    bus = FakeI2C(first, second)
+    manager = BusManager(bus)
+    manager.add(Unit8Encoder(bus, burst=True), name="first", priority=1)
+    manager.add(Unit8Encoder(bus, address=0x42, burst=True), name="second")
+    bus.devices.remove(first)
+    assert manager.poll(now=0) == ["second"]
+    assert manager.errors == 1
+    assert manager.poll(now=0) == []
+    assert manager.poll(now=1) == ["second"]
+    assert manager.errors == 2
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import pytest
+from m5stack_unit8.calibration import Calibration, TAPERS, TAPER_LOG, table_for
+
+
+@pytest.mark.parametrize("taper", TAPERS)
+def test_invert_mirrors_the_course(taper):
+    straight = Calibration(minimum=40, maximum=4060, taper=taper)
+    inverted = Calibration(minimum=40, maximum=4060, taper=taper, invert=True)
+    for raw in range(40, 4061, 7):
+        assert inverted.scale(raw) == straight.scale(4100 - raw)
+    assert inverted.scale(0) == 0xFFFF
+    assert inverted.scale(4095) == 0
+
+
+def test_inverted_log_taper():
+    inverted = Calibration(invert=True, taper=TAPER_LOG)
+    assert inverted.scale(1024) == Calibration(taper=TAPER_LOG).scale(3071)
+    assert inverted.scale(1024) == 20265
+    # still an audio taper, the middle of the course is at -20dB
+    assert inverted.scale(2048) < 0xFFFF // 10
+
+
+def test_dead_zone():
+    calibration = Calibration(minimum=100, maximum=4000, dead_zone=50)
+    assert calibration.scale(120) == 0
+    assert calibration.scale(3960) == 0xFFFF
+
+
+def test_tables_are_shared():
+    assert table_for(Calibration(dead_zone=3)) is table_for(Calibration(dead_zone=3))
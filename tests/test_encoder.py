@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+from m5stack_unit8.encoder import EncoderState, Unit8Encoder
+
+
+def test_burst_is_probed(board):
+    emulator, _, encoder = board
+    assert encoder.burst == emulator.auto_increment
+    assert encoder.get_written_position(1) is None
+
+
+def test_read_positions(board):
+    emulator, bus, encoder = board
+    for num in range(8):
+        emulator.turn(num, 5 * num - 20)
+    bus.reset_counters()
+    assert encoder.positions == tuple(5 * num - 20 for num in range(8))
+    assert bus.transactions == (2 if encoder.burst else 16)
+    assert encoder.increments == tuple(5 * num - 20 for num in range(8))
+    assert encoder.increments == (0,) * 8
+
+
+def test_read_buttons_and_switch(board):
+    emulator, _, encoder = board
+    emulator.press(2)
+    emulator.press(7)
+    emulator.set_switch(True)
+    assert encoder.buttons_mask == 0b10000100
+    assert encoder.buttons == (False, False, True) + (False,) * 4 + (True,)
+    assert encoder.switch
+    state = encoder.snapshot()
+    assert state.buttons == 0b10000100
+    assert state.switch
+    assert state.valid == 0x1FF
+
+
+def test_set_led(board):
+    emulator, _, encoder = board
+    encoder.set_led(4, 0x102030)
+    assert emulator.led(4) == (0x10, 0x20, 0x30)
+    assert encoder.get_led(4) == (0x10, 0x20, 0x30)
+
+
+def test_pixels(board):
+    emulator, bus, encoder = board
+    bus.reset_counters()
+    encoder.pixels.fill(0x000010)
+    assert bus.transactions == 1
+    encoder.pixels[6] = (1, 2, 3)
+    assert emulator.led(0) == (0, 0, 0x10)
+    assert emulator.led(6) == (1, 2, 3)
+    assert emulator.led(8) == (0, 0, 0x10)
+
+
+def test_tracking(board):
+    emulator, bus, _ = board
+    emulator.turn(0, 7)
+    encoder = Unit8Encoder(bus, burst=emulator.auto_increment, tracking=True)
+    emulator.turn(0, -2)
+    emulator.turn(1, 3)
+    assert encoder.positions[:2] == (5, 3)
+    # the increments read with the positions are kept
+    bus.reset_counters()
+    assert encoder.increments[:2] == (5, 3)
+    assert bus.transactions == 0
+    # positions set on the host only
+    encoder.set_position(1, 2**40)
+    encoder.reset()
+    encoder.set_position(2, 2**40)
+    assert bus.transactions == 0
+    emulator.turn(2, 4)
+    assert encoder.get_position(2) == 2**40 + 4
+
+
+def test_tracking_resync(board):
+    emulator, bus, _ = board
+    encoder = Unit8Encoder(bus, burst=emulator.auto_increment, tracking=True)
+    emulator.turn(4, 9)
+    # increments cleared behind the back of the tracking are lost
+    emulator.memory[0x20 + 16] = 0
+    assert encoder.positions[4] == 0
+    encoder.resync()
+    assert encoder.positions[4] == 9
+
+
+def test_tracking_wide_snapshot(board):
+    emulator, bus, _ = board
+    encoder = Unit8Encoder(bus, burst=emulator.auto_increment, tracking=True)
+    encoder.set_position(0, 2**40)
+    encoder.set_position(1, -(2**70))
+    emulator.turn(0, 3)
+    state = encoder.snapshot()
+    assert state.positions[:2] == [2**40 + 3, -(2**70)]
+    # a state made for the non tracking mode
+    state = encoder.snapshot(EncoderState())
+    assert state.positions[:2] == [2**40 + 3, -(2**70)]
+
+
+def test_get_button(board):
+    emulator, _, encoder = board
+    emulator.press(4)
+    assert encoder.get_button(4)
+    assert not encoder.get_button(3)
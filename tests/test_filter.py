@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import pytest
+from m5stack_unit8.filter import JitterFilter, FILTERS
+
+
+@pytest.fixture(name="jitter", params=FILTERS)
+def fixture_jitter(request):
+    return JitterFilter(channels=2, mode=request.param, hysteresis=1000)
+
+
+def settle(jitter, samples, count=40):
+    changed = 0
+    for _ in range(count):
+        changed |= jitter.update(samples)
+    return changed
+
+
+def test_first_update_sets_all(jitter):
+    assert jitter.update([100, 200]) == 0b11
+    assert list(jitter.values) == [100, 200]
+
+
+def test_noise_is_ignored(jitter):
+    jitter.update([30000, 30000])
+    assert settle(jitter, [30500, 29600]) == 0
+    assert list(jitter.values) == [30000, 30000]
+
+
+def test_snap_to_the_ends(jitter):
+    jitter.update([500, 65000])
+    assert settle(jitter, [0, 0xFFFF]) == 0b11
+    assert list(jitter.values) == [0, 0xFFFF]
+
+
+def test_snap_to_maximum():
+    jitter = JitterFilter(channels=1, hysteresis=64, maximum=0xFFF)
+    jitter.update([0xFD0])
+    settle(jitter, [0xFFF])
+    assert jitter.values[0] == 0xFFF
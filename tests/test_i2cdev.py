@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import ctypes
+import pytest
+from m5stack_unit8 import i2cdev
+from m5stack_unit8.angle import Unit8Angle
+from m5stack_unit8.emulator import FakeI2C, Unit8AngleEmulator
+from m5stack_unit8.i2cdev import I2CDev
+
+
+class FakeIoctl:
+    """Run the I2C_RDWR messages on a FakeI2C, count the ioctl calls"""
+
+    def __init__(self, bus, funcs):
+        self.bus = bus
+        self.funcs = funcs
+        self.calls = 0
+
+    def __call__(self, _fd, request, address):
+        if request == i2cdev.I2C_FUNCS:
+            ctypes.c_ulong.from_address(address).value = self.funcs
+            return
+        assert request == i2cdev.I2C_RDWR
+        self.calls += 1
+        data = i2cdev.I2CRdwrData.from_address(address)
+        for index in range(data.nmsgs):
+            message = data.msgs[index]
+            if message.flags & i2cdev.I2C_M_RD:
+                buffer = bytearray(message.len)
+                self.bus.readfrom_into(message.addr, buffer)
+                ctypes.memmove(message.buf, bytes(buffer), message.len)
+            else:
+                buffer = ctypes.string_at(message.buf, message.len)
+                self.bus.writeto(message.addr, buffer)
+
+
+@pytest.fixture(name="ioctl_board", params=[True, False], ids=["mangling", "plain"])
+def fixture_ioctl_board(request):
+    funcs = i2cdev.I2C_FUNC_PROTOCOL_MANGLING if request.param else 0
+    emulator = Unit8AngleEmulator(auto_increment=False)
+    bus = FakeI2C(emulator)
+    ioctl = FakeIoctl(bus, funcs)
+    angle = Unit8Angle(I2CDev(ioctl=ioctl, fd=-1), delay=0)
+    for num in range(8):
+        emulator.set_angle(num, 300 * num + 7)
+    return ioctl, angle
+
+
+def test_functionality(ioctl_board):
+    ioctl, angle = ioctl_board
+    i2c = angle.device.i2c
+    assert i2c.functionality == ioctl.funcs
+    assert (i2c.sweep is not None) == bool(ioctl.funcs)
+
+
+def test_read_angles(ioctl_board):
+    ioctl, angle = ioctl_board
+    ioctl.calls = 0
+    assert angle.angles_12bit == tuple(300 * num + 7 for num in range(8))
+    # one ioctl for the 8 channels when sweeping
+    assert ioctl.calls == (1 if ioctl.funcs else 16)
+
+
+def test_sweep_is_recorded(ioctl_board):
+    _, angle = ioctl_board
+    angle.instrument()
+    assert angle.angles_12bit == tuple(300 * num + 7 for num in range(8))
+    stats = angle.stats()
+    reads = sum(reg["reads"] for reg in stats["registers"].values())
+    assert reads == 8
+    assert len(stats["registers"]) == 8
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import pytest
+from m5stack_unit8.angle import Unit8Angle
+from m5stack_unit8.emulator import FakeI2C, Unit8AngleEmulator, Unit8EncoderEmulator
+from m5stack_unit8.encoder import EncoderState, Unit8Encoder
+from m5stack_unit8.export import CallbackSink, DeltaExporter, FIELD_POSITION
+from m5stack_unit8.retry import RetryPolicy
+from m5stack_unit8.thread_poller import ThreadPoller
+
+
+def make_encoder(**kwargs):
+    emulator = Unit8EncoderEmulator(auto_increment=False)
+    for num in range(8):
+        emulator.turn(num, num + 1)
+    bus = FakeI2C(emulator)
+    return bus, Unit8Encoder(bus, burst=False, **kwargs)
+
+
+def test_errors_raise():
+    bus, encoder = make_encoder()
+    bus.fail_next()
+    with pytest.raises(OSError):
+        encoder.get_position(0)
+
+
+def test_transient_error_is_retried():
+    bus, encoder = make_encoder(retry=RetryPolicy(attempts=3, backoff=0))
+    bus.fail_next(2)
+    assert encoder.positions == tuple(range(1, 9))
+    assert encoder.valid == 0xFF
+
+
+def test_partial_results():
+    bus, encoder = make_encoder(retry=RetryPolicy(attempts=2, backoff=0))
+    # both attempts of the first channel fail
+    bus.fail_next(2)
+    assert encoder.positions == (0,) + tuple(range(2, 9))
+    assert encoder.valid == 0xFE
+    bus.fail_next(2)
+    state = encoder.snapshot()
+    assert state.valid == 0x1FE
+    assert state.positions[0] == 0
+
+
+def test_adaptive_delay():
+    emulator = Unit8AngleEmulator()
+    bus = FakeI2C(emulator)
+    angle = Unit8Angle(bus, delay=None)
+    assert angle.delay == 0
+    emulator.set_angle(3, 4095)
+    bus.fail_next()
+    assert angle.angles_12bit[3] == 4095
+    assert angle.delay > 0
+
+
+def test_failed_button_is_released():
+    bus, encoder = make_encoder(retry=RetryPolicy(attempts=2, backoff=0))
+    bus.fail_next(2)
+    assert encoder.buttons == (False,) * 8
+    assert encoder.valid == 0xFE
+    bus.fail_next(2)
+    assert encoder.buttons_mask == 0
+
+
+def test_exporter_skips_invalid():
+    records = []
+    exporter = DeltaExporter([CallbackSink(records.extend)], window=0)
+    state = EncoderState()
+    state.positions[0] = 5
+    state.positions[1] = 7
+    state.valid = 0x1FE
+    exporter.update(state, now=0)
+    exporter.flush()
+    channels = {(field, channel) for _, _, field, channel, _ in records}
+    assert (FIELD_POSITION, 1) in channels
+    assert (FIELD_POSITION, 0) not in channels
+
+
+def test_poller_keeps_invalid():
+    _, encoder = make_encoder()
+    poller = ThreadPoller(encoder)
+    state = EncoderState()
+    state.positions[0] = 5
+    state.buttons = 0b1
+    # pylint: disable=protected-access
+    poller._publish(state)
+    state.positions[0] = 0
+    state.buttons = 0
+    state.valid = 0x0FE
+    state.switch = True
+    poller._publish(state)
+    assert poller.get("positions")[0] == 5
+    assert poller.get("buttons") == 0b1
+    assert poller.get("switch") is False
+
+
+def test_adaptive_delay_decays():
+    emulator = Unit8AngleEmulator(auto_increment=False)
+    bus = FakeI2C(emulator)
+    angle = Unit8Angle(bus, delay=None)
+    bus.fail_next(3)
+    angle.get_angle(0)
+    assert angle.delay > 0
+    for _ in range(200):
+        angle.get_angle(0)
+    assert angle.delay == 0
+
+
+def test_adaptive_delay_policy():
+    bus = FakeI2C(Unit8AngleEmulator())
+    angle = Unit8Angle(bus, delay=None, retry=RetryPolicy(attempts=3, backoff=0))
+    bus.fail_next(10)
+    with pytest.raises(OSError):
+        angle.get_angle(0)
+    # only doubled for the retries that the policy allows
+    assert angle.delay == pytest.approx(0.0002)
+
+
+def test_missing_board_keeps_delay():
+    bus = FakeI2C(Unit8AngleEmulator())
+    angle = Unit8Angle(bus, delay=None)
+    bus.devices.clear()
+    with pytest.raises(OSError):
+        angle.get_angle(0)
+    assert angle.delay == 0
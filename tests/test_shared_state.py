@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import os
+from multiprocessing import resource_tracker, shared_memory
+import pytest
+from m5stack_unit8 import shared_state
+from m5stack_unit8.emulator import FakeI2C, Unit8EncoderEmulator
+from m5stack_unit8.encoder import Unit8Encoder
+from m5stack_unit8.shared_state import StatePublisher, StateReader
+
+NAME = "m5stack_unit8_test_{}".format(os.getpid())
+
+
+SHARED_MEMORY = shared_memory.SharedMemory
+
+
+def old_shared_memory(name=None, create=False, size=0):
+    """SharedMemory without the track argument of Python 3.13"""
+    return SHARED_MEMORY(name, create, size)
+
+
+@pytest.fixture(name="shared")
+def fixture_shared():
+    emulator = Unit8EncoderEmulator()
+    encoder = Unit8Encoder(FakeI2C(emulator))
+    with StatePublisher(encoder, name=NAME, ring_size=4) as publisher:
+        with StateReader(name=NAME, ring=0) as reader:
+            yield emulator, publisher, reader
+
+
+def test_publish_and_commands(shared):
+    emulator, publisher, reader = shared
+    emulator.turn(3, 7)
+    assert reader.set_led(2, (0, 0, 255))
+    assert reader.set_position(5, -40)
+    publisher.poll()
+    state = reader.read()
+    assert state.reads == 1
+    assert state.positions[3] == 7
+    assert state.positions[5] == -40
+    assert emulator.led(2) == (0, 0, 255)
+
+
+def test_commands_are_validated(shared):
+    _, _, reader = shared
+    with pytest.raises(ValueError):
+        reader.set_led(0, 0x1000000)
+    with pytest.raises(ValueError):
+        reader.set_led(0, 0, brightness=101)
+    with pytest.raises(ValueError):
+        reader.set_position(0, 1 << 40)
+
+
+def test_bad_command_is_counted(shared):
+    emulator, publisher, reader = shared
+    # pylint: disable=protected-access
+    assert reader._send(shared_state.CMD_SET_LED, 12, 0xFF)
+    assert reader.set_led(1, 0xFF0000)
+    publisher.poll()
+    assert publisher.errors == 1
+    assert isinstance(publisher.last_error, ValueError)
+    assert publisher.reads == 1
+    assert emulator.led(1) == (255, 0, 0)
+
+
+def test_full_ring(shared):
+    _, publisher, reader = shared
+    for _ in range(4):
+        assert reader.reset()
+    assert not reader.reset()
+    publisher.poll()
+    assert reader.reset()
+
+
+def test_read_times_out(shared):
+    _, publisher, reader = shared
+    publisher.poll()
+    # pylint: disable=protected-access
+    shared_state._SEQUENCE.pack_into(
+        publisher.memory.buf, shared_state._SEQUENCE_OFFSET, 3
+    )
+    with pytest.raises(TimeoutError):
+        reader.read(timeout=0.01)
+
+
+def test_ring_size_is_checked():
+    encoder = Unit8Encoder(FakeI2C(Unit8EncoderEmulator()))
+    with pytest.raises(ValueError):
+        StatePublisher(encoder, name=NAME, ring_size=256)
+    # no segment was left behind
+    with pytest.raises(FileNotFoundError):
+        StateReader(name=NAME)
+
+
+def test_reader_shares_tracker(shared, monkeypatch):
+    _, publisher, _ = shared
+    unregistered = []
+    monkeypatch.setattr(
+        resource_tracker, "unregister", lambda name, kind: unregistered.append(name)
+    )
+    monkeypatch.setattr(shared_memory, "SharedMemory", old_shared_memory)
+    StateReader(name=NAME).close()
+    assert not unregistered
+    # a publisher with another tracker
+    # pylint: disable=protected-access
+    shared_state._TRACKER.pack_into(
+        publisher.memory.buf, shared_state._TRACKER_OFFSET, 1
+    )
+    StateReader(name=NAME).close()
+    assert len(unregistered) == 1
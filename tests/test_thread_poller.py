@@ -0,0 +1,28 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Neradoc https://neradoc.me
+# SPDX-License-Identifier: MIT
+
+import time
+from m5stack_unit8.emulator import FakeI2C, Unit8EncoderEmulator
+from m5stack_unit8.encoder import Unit8Encoder
+from m5stack_unit8.thread_poller import ThreadPoller
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_failing_command_is_counted():
+    emulator = Unit8EncoderEmulator()
+    encoder = Unit8Encoder(FakeI2C(emulator))
+    with ThreadPoller(encoder, rate=200) as poller:
+        poller.submit(encoder.set_led, 12, 0xFF)
+        poller.submit(encoder.set_position, 2, 30)
+        wait_for(lambda: poller.get("positions") is not None)
+        wait_for(lambda: poller.get("positions")[2] == 30)
+        assert poller.errors == 1
+        assert isinstance(poller.last_error, ValueError)
+        emulator.turn(4, 3)
+        wait_for(lambda: poller.get("positions")[4] == 3)